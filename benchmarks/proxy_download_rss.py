@@ -0,0 +1,106 @@
+"""Measure peak RSS while proxying a large file through the catalog
+download proxy.
+
+A sparse stand-in file of the requested size is served by a local HTTP
+server, and streamed to a discarding client through the same code path
+as `/catalog/proxy-download`. Run with::
+
+    python benchmarks/proxy_download_rss.py --size-gb 4
+
+Pass `--buffered` to measure the previous (whole file in memory)
+behaviour for comparison; beware that this needs at least `--size-gb`
+of free memory.
+"""
+import argparse
+import functools
+import http.server
+import resource
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+from flask import Flask, Response, request
+
+from odp.ui.base.lib import proxy
+from odp.ui.transport import Transport
+
+
+def max_rss_mib() -> float:
+    # ru_maxrss is reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def serve_directory(directory: Path) -> http.server.ThreadingHTTPServer:
+    handler = functools.partial(_QuietHandler, directory=str(directory))
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def create_app(buffered: bool, chunk_size: int) -> Flask:
+    app = Flask(__name__)
+    session = Transport().session()
+
+    @app.route('/proxy-download')
+    def proxy_download():
+        url = request.args['url']
+        if buffered:
+            r = requests.get(url)
+            return Response(r.content, content_type=r.headers.get('Content-Type'))
+
+        return proxy.stream_response(
+            session, url, request.headers,
+            chunk_size=chunk_size,
+            timeout=(5, 60),
+        )
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-gb', type=float, default=2)
+    parser.add_argument('--chunk-size', type=int, default=65536)
+    parser.add_argument('--buffered', action='store_true')
+    args = parser.parse_args()
+
+    size = int(args.size_gb * 1024 ** 3)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        standin = Path(tmpdir) / 'standin.bin'
+        with open(standin, 'wb') as f:
+            f.truncate(size)
+
+        server = serve_directory(Path(tmpdir))
+        url = f'http://127.0.0.1:{server.server_port}/{standin.name}'
+        client = create_app(args.buffered, args.chunk_size).test_client()
+
+        rss_before = max_rss_mib()
+        start = time.perf_counter()
+
+        response = client.get('/proxy-download', query_string={'url': url}, buffered=False)
+        received = sum(len(chunk) for chunk in response.response)
+        response.close()
+
+        elapsed = time.perf_counter() - start
+        rss_after = max_rss_mib()
+        server.shutdown()
+
+    assert received == size, f'received {received} of {size} bytes'
+
+    print(f'mode:          {"buffered" if args.buffered else "streaming"}')
+    print(f'file size:     {size / 1024 ** 2:.0f} MiB')
+    print(f'elapsed:       {elapsed:.1f} s ({size / 1024 ** 2 / elapsed:.0f} MiB/s)')
+    print(f'peak RSS:      {rss_after:.1f} MiB')
+    print(f'peak RSS gain: {rss_after - rss_before:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
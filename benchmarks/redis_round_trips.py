@@ -0,0 +1,157 @@
+"""Count Redis commands and round trips per authenticated page view.
+
+A logged-in user's session state (user, permissions and token) is seeded
+in Redis, and a page that checks the user's permissions and reads their
+access token (as any API call does) is requested repeatedly through a
+test client. Requires a Redis server; run with::
+
+    python benchmarks/redis_round_trips.py --redis-url redis://localhost:6379/15
+
+Pass `--legacy` to measure the previous behaviour (a separate Redis read
+for each of the user, permissions and token) for comparison. The local
+user cache is disabled by default, so that every view goes to Redis;
+pass `--local-cache-ttl` to measure with it enabled.
+"""
+import argparse
+import json
+
+import redis
+from flask import Flask, g
+from flask_login import current_user
+
+from odp.ui.client import LocalUser, ODPUserClient
+
+
+class CountingConnection(redis.Connection):
+    """A Redis connection that counts the commands and round trips sent on it."""
+
+    commands = 0
+    round_trips = 0
+
+    def send_packed_command(self, command, check_health=True):
+        CountingConnection.round_trips += 1
+        super().send_packed_command(command, check_health)
+
+    def send_command(self, *args, **kwargs):
+        CountingConnection.commands += 1
+        super().send_command(*args, **kwargs)
+
+    def pack_commands(self, commands):
+        commands = list(commands)
+        CountingConnection.commands += len(commands)
+        return super().pack_commands(commands)
+
+
+class LegacyODPUserClient(ODPUserClient):
+    """Reads the user, permissions and token as it was done before the
+    session state loader was introduced."""
+
+    def _get_user(self, user_id):
+        self._listen_for_invalidation()
+        if user := self._local_cache.get((user_id, 'user')):
+            return user
+
+        if serialized_user := self.cache.get(self._cache_key(user_id, 'user')):
+            user = LocalUser(**json.loads(serialized_user))
+            self._local_cache.set((user_id, 'user'), user)
+            return user
+
+    def _get_permissions(self, user_id):
+        self._listen_for_invalidation()
+        if (permissions := self._local_cache.get((user_id, 'permissions'))) is not None:
+            return permissions
+
+        permissions = {}
+        if serialized_permissions := self.cache.get(self._cache_key(user_id, 'permissions')):
+            permissions = json.loads(serialized_permissions)
+
+        self._local_cache.set((user_id, 'permissions'), permissions)
+        return permissions
+
+    def _fetch_token(self, hydra):
+        if user_id := current_user.get_id():
+            return self.cache.hgetall(self._cache_key(user_id, 'token'))
+
+
+def create_app(cache: redis.Redis, legacy: bool, local_cache_ttl: float) -> Flask:
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'benchmark'
+
+    client_cls = LegacyODPUserClient if legacy else ODPUserClient
+    cli = client_cls(
+        api_url='http://odp.invalid/api',
+        hydra_url='http://odp.invalid/auth',
+        client_id='benchmark',
+        client_secret='benchmark',
+        scope=['odp.package:read'],
+        cache=cache,
+        app=app,
+        local_cache_ttl=local_cache_ttl,
+    )
+
+    @app.route('/page')
+    @cli.user()
+    def page():
+        # an API call reads the token via the Authlib app, as does this
+        token = cli.oauth.hydra.token
+        return {'permissions': len(g.user_permissions), 'token': token['access_token']}
+
+    app.extensions['odp_benchmark_client'] = cli
+    return app
+
+
+def seed(cli: ODPUserClient, user_id: str) -> None:
+    cli.cache.hset(cli._cache_key(user_id, 'token'), mapping={
+        'access_token': 'access', 'refresh_token': 'refresh', 'token_type': 'bearer', 'expires_at': 2 ** 31,
+    })
+    cli.cache.set(cli._cache_key(user_id, 'user'), json.dumps(dict(
+        id=user_id, name='Benchmark User', email='benchmark@example.org',
+        active=True, verified=True, picture=None, role_ids=[],
+    )))
+    cli.cache.set(cli._cache_key(user_id, 'permissions'), json.dumps({'odp.package:read': '*'}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--redis-url', default='redis://localhost:6379/15')
+    parser.add_argument('--views', type=int, default=100)
+    parser.add_argument('--local-cache-ttl', type=float, default=0)
+    parser.add_argument('--legacy', action='store_true')
+    args = parser.parse_args()
+
+    pool = redis.ConnectionPool.from_url(
+        args.redis_url,
+        connection_class=CountingConnection,
+        decode_responses=True,
+    )
+    cache = redis.Redis(connection_pool=pool)
+
+    app = create_app(cache, args.legacy, args.local_cache_ttl)
+    cli = app.extensions['odp_benchmark_client']
+    user_id = 'benchmark-user'
+    seed(cli, user_id)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = user_id
+        session['_fresh'] = True
+
+    # warm up, subscribing to cache invalidation messages
+    assert client.get('/page').status_code == 200
+
+    CountingConnection.commands = CountingConnection.round_trips = 0
+    for _ in range(args.views):
+        assert client.get('/page').status_code == 200
+
+    print(f'mode:                  {"legacy" if args.legacy else "session state loader"}')
+    print(f'local cache TTL:       {args.local_cache_ttl:g} s')
+    print(f'page views:            {args.views}')
+    print(f'commands per view:     {CountingConnection.commands / args.views:.2f}')
+    print(f'round trips per view:  {CountingConnection.round_trips / args.views:.2f}')
+
+    for key in ('token', 'user', 'permissions'):
+        cache.delete(cli._cache_key(user_id, key))
+
+
+if __name__ == '__main__':
+    main()
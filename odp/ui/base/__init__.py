@@ -1,7 +1,7 @@
 from pathlib import Path
 
 import redis
-from flask import Flask, session, request
+from flask import Flask
 from jinja2 import ChoiceLoader, FileSystemLoader
 from werkzeug.middleware.proxy_fix import ProxyFix
 
@@ -9,6 +9,8 @@ import odp.logfile
 from odp.config import config
 from odp.ui.base import forms, templates, views
 from odp.ui.client import ODPAnonClient, ODPUserClient
+from odp.ui.session import RedisSessionInterface
+from odp.ui.transport import Transport, TransportConfig
 from odp.version import VERSION
 
 api: ODPUserClient
@@ -17,6 +19,12 @@ api: ODPUserClient
 cli: ODPAnonClient
 """ODP client for client-authenticated API access."""
 
+redis_cache: redis.Redis
+"""Redis connection shared by the UI clients and caches."""
+
+transport: Transport
+"""Pooled HTTP transport shared by the UI clients and upstream requests."""
+
 
 def init_app(
         app: Flask,
@@ -25,7 +33,8 @@ def init_app(
         client_api: bool = False,
         template_dir: Path,
         macro_dir: Path = None,
-        api_url: str = None
+        api_url: str = None,
+        server_session: bool = False,
 ):
     """Base initialization for an ODP UI application.
 
@@ -35,6 +44,7 @@ def init_app(
     :param template_dir: the app's local template directory
     :param macro_dir: the app's local macro directory
     :param api_url: the app's api url. Defaults to the URL of the ODP API if not specified.
+    :param server_session: store sessions in Redis, with only a session id in the cookie
     """
     odp.logfile.initialize()
 
@@ -50,6 +60,22 @@ def init_app(
         SESSION_COOKIE_SECURE=True,
     )
 
+    global transport
+    transport = Transport(TransportConfig.from_app(app))
+    app.extensions['odp_transport'] = transport
+    app.teardown_request(lambda exc: app.extensions['odp_transport'].log_stats())
+
+    global redis_cache
+    redis_cache = redis.Redis(
+        host=config.REDIS.HOST,
+        port=config.REDIS.PORT,
+        db=config.REDIS.DB,
+        decode_responses=True,
+    )
+
+    if server_session:
+        app.session_interface = RedisSessionInterface(redis_cache, f'{app.name}.session')
+
     if user_api:
         global api
         api = ODPUserClient(
@@ -58,13 +84,12 @@ def init_app(
             client_id=app.config['UI_CLIENT_ID'],
             client_secret=app.config['UI_CLIENT_SECRET'],
             scope=app.config['UI_CLIENT_SCOPE'],
-            cache=redis.Redis(
-                host=config.REDIS.HOST,
-                port=config.REDIS.PORT,
-                db=config.REDIS.DB,
-                decode_responses=True,
-            ),
+            cache=redis_cache,
             app=app,
+            transport=transport,
+            max_workers=app.config.get('API_MAX_WORKERS', 8),
+            local_cache_ttl=app.config.get('USER_CACHE_TTL', 30),
+            token_refresh_margin=app.config.get('TOKEN_REFRESH_MARGIN', 300),
         )
 
     if client_api:
@@ -75,7 +100,11 @@ def init_app(
             client_id=app.config['CI_CLIENT_ID'],
             client_secret=app.config['CI_CLIENT_SECRET'],
             scope=app.config['CI_CLIENT_SCOPE'],
+            transport=transport,
+            max_workers=app.config.get('API_MAX_WORKERS', 8),
+            token_store=redis_cache,
         )
+        cli.warm_up()
 
     base_dir = Path(__file__).parent
 
@@ -97,8 +126,3 @@ def init_app(
 
     # trust the X-Forwarded-* headers set by the proxy server
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_prefix=1)
-
-    @app.context_processor
-    def set_active_url():
-        session['active_page_url'] = request.url
-        return dict()
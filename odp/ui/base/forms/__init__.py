@@ -1,8 +1,14 @@
 from flask import Flask
 
-from odp.ui.base.forms._base import BaseForm
+from odp.ui.base.forms._base import BaseForm, SharedSessionCSRF
 from odp.ui.base.forms._keywords import InstitutionKeywordForm
-from odp.ui.base.forms._packages import FileUploadForm, PackageCreateForm, ZipUploadForm
+from odp.ui.base.forms._packages import (
+    ChunkedUploadForm,
+    FileUploadForm,
+    PackageCreateForm,
+    UploadChunkForm,
+    ZipUploadForm,
+)
 from odp.ui.base.forms._search import CatalogSearchForm, ResourceSearchForm
 from odp.ui.base.forms._tags import (
     AbstractTagForm,
@@ -19,3 +25,5 @@ from odp.ui.base.forms._tags import (
 
 def init_app(app: Flask):
     BaseForm.Meta.csrf_secret = bytes(app.config['SECRET_KEY'], 'utf-8')
+    if app.config.get('CSRF_SHARED_TOKEN', True):
+        BaseForm.Meta.csrf_class = SharedSessionCSRF
@@ -1,8 +1,46 @@
-from flask import session
-from wtforms import Form
+from flask import g, session
+from wtforms import Form, ValidationError
+from wtforms.csrf.core import CSRFTokenField
 from wtforms.csrf.session import SessionCSRF
 
 
+class LazyCSRFTokenField(CSRFTokenField):
+    """A CSRF token field that obtains its token when it is rendered,
+    rather than when its form is built."""
+
+    def process(self, *args, **kwargs):
+        # skip CSRFTokenField.process, which generates the token
+        super(CSRFTokenField, self).process(*args, **kwargs)
+
+    def _value(self):
+        return self.csrf_impl.generate_csrf_token(self)
+
+
+class SharedSessionCSRF(SessionCSRF):
+    """Session CSRF with one token per request, shared by all the forms
+    built in the request.
+
+    The token (and, for a new session, the session's CSRF secret) is only
+    derived when a form is rendered, so building forms that are not
+    rendered costs nothing and leaves the session untouched.
+    """
+
+    field_class = LazyCSRFTokenField
+
+    def generate_csrf_token(self, csrf_token_field):
+        if (token := g.get('csrf_token')) is None:
+            token = g.csrf_token = super().generate_csrf_token(csrf_token_field)
+        return token
+
+    def validate_csrf_token(self, form, field):
+        # the secret is only created when a form is rendered, so a fresh
+        # (or expired) session may not have one
+        if 'csrf' not in self.session:
+            raise ValidationError(field.gettext('CSRF failed.'))
+
+        super().validate_csrf_token(form, field)
+
+
 class BaseForm(Form):
     class Meta:
         csrf = True
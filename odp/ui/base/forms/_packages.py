@@ -1,5 +1,5 @@
-from wtforms import FileField, SelectField, StringField, ValidationError
-from wtforms.validators import data_required, input_required
+from wtforms import BooleanField, FileField, IntegerField, SelectField, StringField, ValidationError
+from wtforms.validators import data_required, input_required, number_range, regexp
 
 from odp.ui.base.forms import BaseForm
 from odp.ui.base.forms.validators import file_required
@@ -35,10 +35,6 @@ class FileUploadForm(BaseForm):
         label='Content type',
         render_kw={'readonly': ''},
     )
-    sha256 = StringField(
-        label='SHA-256 checksum',
-        render_kw={'readonly': ''},
-    )
 
 
 class ZipUploadForm(BaseForm):
@@ -54,11 +50,35 @@ class ZipUploadForm(BaseForm):
         label='Content type',
         render_kw={'readonly': ''},
     )
-    zip_sha256 = StringField(
-        label='SHA-256 checksum',
-        render_kw={'readonly': ''},
-    )
 
     def validate_zip_file(self, field):
         if self.zip_mimetype.data != 'application/zip':
             raise ValidationError('Only .zip files are supported for zip upload')
+
+
+class ChunkedUploadForm(BaseForm):
+    """Initiates a chunked upload of a file or zip file. The file content
+    follows in chunks, each verified against its own SHA-256 checksum."""
+    filename = StringField(
+        validators=[data_required()],
+    )
+    size = IntegerField(
+        validators=[input_required(), number_range(min=0)],
+    )
+    mimetype = StringField()
+    title = StringField()
+    description = StringField()
+    unpack = BooleanField()
+
+    def validate_unpack(self, field):
+        if field.data and self.mimetype.data != 'application/zip':
+            raise ValidationError('Only .zip files are supported for zip upload')
+
+
+class UploadChunkForm(BaseForm):
+    offset = IntegerField(
+        validators=[input_required(), number_range(min=0)],
+    )
+    sha256 = StringField(
+        validators=[regexp('^[0-9a-fA-F]{64}$', message='Expecting a SHA-256 checksum')],
+    )
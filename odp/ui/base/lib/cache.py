@@ -0,0 +1,118 @@
+import json
+import re
+from typing import Any, Callable, Iterable
+
+from redis import Redis, WatchError
+
+
+class RedisCache:
+    """A namespaced cache over a shared Redis connection.
+
+    The interface follows that of `odp.lib.cache.Cache`, with the
+    addition of bulk reads and writes that cost a single Redis round
+    trip regardless of the number of keys.
+    """
+
+    def __init__(self, redis: Redis, *namespace: str) -> None:
+        self.redis = redis
+        self.namespace = namespace
+
+    def get(self, *keys: str) -> str | None:
+        return self.redis.get(self._key(*keys))
+
+    def set(self, *keys: str, value: str, expiry: int = None) -> None:
+        self.redis.set(self._key(*keys), value, ex=expiry)
+
+    def add(self, *keys: str, value: str, expiry: int = None) -> bool:
+        """Set a value only if the key is not already set; return
+        whether the value was set. Usable as a simple lock."""
+        return bool(self.redis.set(self._key(*keys), value, ex=expiry, nx=True))
+
+    def extend(self, *keys: str, value: str, expiry: int) -> bool:
+        """Reset the expiry of a key that still holds `value` (e.g. a lock
+        token); return whether the key was extended."""
+        return self._if_value(self._key(*keys), value, lambda pipe, key: pipe.expire(key, expiry))
+
+    def release(self, *keys: str, value: str) -> bool:
+        """Delete a key that still holds `value` (e.g. a lock token);
+        return whether the key was deleted."""
+        return self._if_value(self._key(*keys), value, lambda pipe, key: pipe.delete(key))
+
+    def jget(self, *keys: str) -> Any:
+        if (value := self.get(*keys)) is not None:
+            return json.loads(value)
+
+    def jset(self, *keys: str, value: Any, expiry: int = None) -> None:
+        self.set(*keys, value=json.dumps(value), expiry=expiry)
+
+    def delete(self, *keys: str) -> None:
+        self.redis.delete(self._key(*keys))
+
+    def purge(self, *keys: str) -> None:
+        """Delete every key that extends the given key tuple."""
+        pattern = re.sub(r'([*?\[\]\\])', r'\\\1', self._key(*keys)) + '.*'
+        with self.redis.pipeline(transaction=False) as pipe:
+            for key in self.redis.scan_iter(match=pattern, count=1000):
+                pipe.delete(key)
+            pipe.execute()
+
+    def mget(self, keys: Iterable[tuple[str, ...]]) -> list[str | None]:
+        """Get the values for a list of key tuples, in one round trip."""
+        if not (keys := list(keys)):
+            return []
+        return self.redis.mget([self._key(*k) for k in keys])
+
+    def mset(
+            self,
+            values: dict[tuple[str, ...], str],
+            expiry: int | Callable[[str], int] = None,
+    ) -> None:
+        """Set values for multiple key tuples, in one pipelined round trip.
+
+        `expiry` may be a callable taking a value and returning its expiry,
+        so that each value may be given its own (e.g. randomized) lifetime.
+        """
+        self._mset(
+            (k, value, expiry(value) if callable(expiry) else expiry)
+            for k, value in values.items()
+        )
+
+    def jmget(self, keys: Iterable[tuple[str, ...]]) -> list[Any]:
+        return [
+            json.loads(value) if value is not None else None
+            for value in self.mget(keys)
+        ]
+
+    def jmset(
+            self,
+            values: dict[tuple[str, ...], Any],
+            expiry: int | Callable[[Any], int] = None,
+    ) -> None:
+        self._mset(
+            (k, json.dumps(value), expiry(value) if callable(expiry) else expiry)
+            for k, value in values.items()
+        )
+
+    def _mset(self, items: Iterable[tuple[tuple[str, ...], str, int | None]]) -> None:
+        if not (items := list(items)):
+            return
+        with self.redis.pipeline(transaction=False) as pipe:
+            for k, value, expiry in items:
+                pipe.set(self._key(*k), value, ex=expiry)
+            pipe.execute()
+
+    def _if_value(self, key: str, value: str, command: Callable) -> bool:
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                if pipe.get(key) != value:
+                    return False
+                pipe.multi()
+                command(pipe, key)
+                pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    def _key(self, *keys: str) -> str:
+        return '.'.join(self.namespace + keys)
@@ -0,0 +1,27 @@
+import hashlib
+import json
+from typing import Any
+
+from flask import Response, request
+
+
+def etag_for(*parts: Any) -> str:
+    """Return a strong entity tag derived from `parts`, which must
+    together determine the representation being served."""
+    return hashlib.sha256(
+        json.dumps(parts, sort_keys=True, default=str).encode()
+    ).hexdigest()[:32]
+
+
+def is_not_modified(etag: str) -> bool:
+    """Check whether the client already holds the representation tagged `etag`."""
+    return request.if_none_match.contains(etag)
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    """Return an empty 304 response, with the validator and caching
+    headers that the full response would have carried."""
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
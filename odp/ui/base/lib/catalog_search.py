@@ -0,0 +1,185 @@
+import hashlib
+import json
+import logging
+import time
+from typing import Iterable
+
+from flask import current_app
+
+from odp.lib.client import ODPAPIError
+from odp.ui.base import cli, redis_cache
+from odp.ui.base.lib.cache import RedisCache
+
+logger = logging.getLogger(__name__)
+
+BOUND_PARAMS = ('north_bound', 'east_bound', 'south_bound', 'west_bound')
+
+COORDINATE_PRECISION = 4
+"""Decimal places to which bounding box coordinates are rounded (about 11 m)."""
+
+REFRESH_LOCK_EXPIRY = 30
+"""Seconds for which a background refresh of a search result is exclusive."""
+
+search_cache = RedisCache(redis_cache, 'catalog', 'search')
+
+
+def normalize_query(**params) -> dict:
+    """Return a canonical form of catalog search parameters, such that
+    equivalent searches have equal queries.
+
+    Empty parameters are dropped, facets are sorted, bounding box
+    coordinates are rounded and numbers are parsed.
+    """
+    query = {}
+    for name, value in params.items():
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == '':
+            continue
+
+        if name == 'facet_query':
+            if not (facets := json.loads(value) if isinstance(value, str) else value):
+                continue
+            value = json.dumps(facets, sort_keys=True)
+
+        elif name in BOUND_PARAMS:
+            try:
+                value = round(float(value), COORDINATE_PRECISION)
+            except ValueError:
+                pass
+
+        elif name in ('page', 'size'):
+            try:
+                value = int(value)
+            except ValueError:
+                pass
+
+        query[name] = value
+
+    return query
+
+
+def search(catalog_id: str, **params) -> dict:
+    """Search the catalog, with results cached in Redis.
+
+    Results are keyed by the normalized query and by the catalog's
+    timestamp, so that they are invalidated when the catalog publishes.
+    A result is fresh for CATALOG_SEARCH_TTL seconds; for a further
+    CATALOG_SEARCH_STALE_TTL seconds it is still served, while a single
+    background request refreshes it.
+    """
+    query = normalize_query(**params)
+    key = _cache_key(catalog_id, query)
+
+    if entry := search_cache.jget(*key):
+        if entry['fresh_until'] < time.time() and \
+                search_cache.add(*key, 'refresh', value='1', expiry=REFRESH_LOCK_EXPIRY):
+            _submit_refresh(catalog_id, query, key)
+
+        return entry['result']
+
+    return _fetch(catalog_id, query, key, *_ttls())
+
+
+def prefetch(catalog_id: str, **params) -> None:
+    """Warm the search cache for the given parameters in the background,
+    unless a fresh result is already cached or being fetched."""
+    query = normalize_query(**params)
+    key = _cache_key(catalog_id, query)
+
+    if (entry := search_cache.jget(*key)) and entry['fresh_until'] >= time.time():
+        return
+
+    if search_cache.add(*key, 'refresh', value='1', expiry=REFRESH_LOCK_EXPIRY):
+        _submit_refresh(catalog_id, query, key)
+
+
+def catalog_stamp(catalog_id: str) -> str:
+    """Return the catalog's timestamp, which changes when it publishes.
+    This is cached for CATALOG_STAMP_TTL seconds."""
+    if (stamp := cached_catalog_stamp(catalog_id)) is None:
+        stamp = fetch_catalog(catalog_id).get('timestamp') or ''
+
+    return stamp
+
+
+def cached_catalog_stamp(catalog_id: str) -> str | None:
+    """Return the catalog's cached timestamp, or None if it has expired."""
+    return search_cache.get(catalog_id, 'stamp')
+
+
+def fetch_catalog(catalog_id: str) -> dict:
+    """Fetch the catalog from the API, caching its timestamp for
+    `catalog_stamp`; callers that need the catalog object anyway can
+    so refresh the stamp without a second request."""
+    catalog = cli.get(f'/catalog/{catalog_id}')
+    search_cache.set(
+        catalog_id, 'stamp',
+        value=catalog.get('timestamp') or '',
+        expiry=current_app.config.get('CATALOG_STAMP_TTL', 60),
+    )
+    return catalog
+
+
+def subset(catalog_id: str, record_ids: Iterable[str], page: int, size: int) -> dict:
+    """Fetch a page of the catalog records identified by `record_ids`
+    (record ids and/or DOIs), with results cached in Redis.
+
+    Pages are keyed by the sorted, de-duplicated id list and by the
+    catalog's timestamp, so that a large selection is fetched a page at
+    a time, and each page only once until the catalog publishes or
+    CATALOG_SUBSET_TTL seconds pass.
+    """
+    record_ids = sorted(set(record_ids))
+    ids_hash = hashlib.sha256(json.dumps(record_ids).encode()).hexdigest()[:32]
+    key = catalog_id, catalog_stamp(catalog_id), 'subset', ids_hash, str(page), str(size)
+
+    if (result := search_cache.jget(*key)) is None:
+        result = cli.get(
+            f'/catalog/{catalog_id}/subset',
+            record_id_or_doi_list=record_ids,
+            page=page,
+            size=size,
+        )
+        search_cache.jset(*key, value=result, expiry=current_app.config.get('CATALOG_SUBSET_TTL', 600))
+
+    return result
+
+
+def _cache_key(catalog_id: str, query: dict) -> tuple[str, ...]:
+    query_hash = hashlib.sha256(json.dumps(query, sort_keys=True).encode()).hexdigest()[:32]
+    return catalog_id, catalog_stamp(catalog_id), query_hash
+
+
+def _ttls() -> tuple[int, int]:
+    return (
+        current_app.config.get('CATALOG_SEARCH_TTL', 60),
+        current_app.config.get('CATALOG_SEARCH_STALE_TTL', 600),
+    )
+
+
+def _fetch(catalog_id: str, query: dict, key: tuple[str, ...], ttl: int, stale_ttl: int) -> dict:
+    result = cli.get(f'/catalog/{catalog_id}/search', **query)
+    search_cache.jset(
+        *key,
+        value={'result': result, 'fresh_until': time.time() + ttl},
+        expiry=ttl + stale_ttl,
+    )
+    return result
+
+
+def _submit_refresh(catalog_id: str, query: dict, key: tuple[str, ...]) -> None:
+    # read the config now; the refresh may outlive the request
+    ttl, stale_ttl = _ttls()
+    cli.submit(lambda: _refresh(catalog_id, query, key, ttl, stale_ttl))
+
+
+def _refresh(catalog_id: str, query: dict, key: tuple[str, ...], ttl: int, stale_ttl: int) -> None:
+    try:
+        _fetch(catalog_id, query, key, ttl, stale_ttl)
+    except ODPAPIError as e:
+        logger.warning('Catalog search refresh failed (%d): %s', e.status_code, e.error_detail)
+    except Exception:
+        logger.exception('Catalog search refresh failed')
+    finally:
+        search_cache.delete(*key, 'refresh')
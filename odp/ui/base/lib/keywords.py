@@ -0,0 +1,73 @@
+import logging
+from functools import partial
+from random import randint
+from typing import Iterable
+
+from flask import g
+
+from odp.lib.client import ODPAPIError
+from odp.ui.base.lib.cache import RedisCache
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_keywords(keyword_ids: Iterable[int]) -> None:
+    """Resolve a set of keyword ids into `g.keywords`, for lookup by
+    the `keyword` template filter.
+
+    Cached keywords are fetched from Redis in a single round trip, and
+    the rest from the API concurrently. A keyword that cannot be fetched
+    is given a placeholder object (with its id as key) rather than
+    failing the page. The cli client must have scope `odp.keyword:read_all`.
+    """
+    from odp.ui.base import cli
+
+    keyword_cache = _keyword_cache()
+    keyword_ids = sorted(set(keyword_ids) - g.get('keywords', {}).keys())
+    keywords = dict(zip(keyword_ids, keyword_cache.jmget(
+        ('keyword', str(keyword_id)) for keyword_id in keyword_ids
+    )))
+
+    if misses := [keyword_id for keyword_id, kw_obj in keywords.items() if kw_obj is None]:
+        fetched = dict(zip(misses, cli.gather(*(
+            partial(_fetch_keyword, keyword_id) for keyword_id in misses
+        ))))
+
+        # For keywords awaiting approval, expire quickly, otherwise keep
+        # cached for between 7 and 14 days. Keyword objects will rarely
+        # change, but we must expire them in case they ever do.
+        keyword_cache.jmset(
+            {('keyword', str(keyword_id)): kw_obj for keyword_id, kw_obj in fetched.items() if kw_obj},
+            expiry=lambda kw_obj: 3600 if kw_obj['status'] == 'proposed' else randint(604800, 1209600),
+        )
+        keywords |= fetched
+
+    g.keywords = g.get('keywords', {}) | {
+        keyword_id: kw_obj or _placeholder(keyword_id)
+        for keyword_id, kw_obj in keywords.items()
+    }
+
+
+def _keyword_cache() -> RedisCache:
+    # the cli client is only created on app init, so it is read at call time
+    from odp.ui.base import cli, redis_cache
+
+    return RedisCache(redis_cache, cli.__class__.__name__, cli.client_id)
+
+
+def _fetch_keyword(keyword_id: int) -> dict | None:
+    from odp.ui.base import cli
+
+    try:
+        return cli.get(f'/keyword/{keyword_id}')
+    except ODPAPIError as e:
+        logger.warning('Failed to fetch keyword %s (%d): %s', keyword_id, e.status_code, e.error_detail)
+
+
+def _placeholder(keyword_id: int) -> dict:
+    return {
+        'id': keyword_id,
+        'key': str(keyword_id),
+        'data': {},
+        'status': None,
+    }
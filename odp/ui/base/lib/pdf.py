@@ -0,0 +1,279 @@
+import base64
+import hashlib
+import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from functools import cache
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+# This module is imported by the PDF rendering processes, which do not
+# initialize the app; app globals are therefore imported where used.
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def render_metadata_pdf(records: list[dict]) -> bytes:
+    """Return a PDF of the metadata of the given catalog records, one
+    record per page.
+
+    Rendered PDFs of up to PDF_CACHE_MAX_SIZE bytes are cached in Redis
+    for PDF_CACHE_EXPIRY seconds, keyed on a hash of the records. Rendering
+    runs in a pool of PDF_WORKERS processes, so that a burst of exports
+    queues there rather than occupying the web workers' CPU. If a
+    rendering process dies, the pool is replaced and the render retried
+    once.
+    """
+    from flask import current_app
+
+    from odp.ui.base import redis_cache
+    from odp.ui.base.lib.cache import RedisCache
+
+    pdf_cache = RedisCache(redis_cache, 'catalog', 'pdf')
+    key = hashlib.sha256(json.dumps(records, sort_keys=True).encode()).hexdigest()
+
+    if (pdf := pdf_cache.get(key)) is not None:
+        return base64.b64decode(pdf)
+
+    max_workers = current_app.config.get('PDF_WORKERS', 2)
+    timeout = current_app.config.get('PDF_RENDER_TIMEOUT', 60)
+    for retry in (False, True):
+        executor = _get_executor(max_workers)
+        try:
+            pdf = executor.submit(build_metadata_pdf, records).result(timeout=timeout)
+            break
+        except BrokenProcessPool:
+            _discard_executor(executor)
+            if retry:
+                raise
+
+    if len(pdf) <= current_app.config.get('PDF_CACHE_MAX_SIZE', 1048576):
+        # the shared Redis connection decodes responses, so store as text
+        pdf_cache.set(
+            key,
+            value=base64.b64encode(pdf).decode(),
+            expiry=current_app.config.get('PDF_CACHE_EXPIRY', 86400),
+        )
+    return pdf
+
+
+def build_metadata_pdf(records: list[dict]) -> bytes:
+    """Return a PDF containing, for each record, a page with a metadata
+    table that mimics the one shown in the screenshots.
+    """
+    story = []
+    for record in records:
+        if story:
+            story.append(PageBreak())
+        story += [_metadata_table(record), Spacer(1, 0.2 * inch)]
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=40,
+        leftMargin=40,
+        topMargin=40,
+        bottomMargin=40,
+    )
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def _get_executor(max_workers: int) -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn rather than fork, as the web worker may be multi-threaded
+            _executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+    return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor) -> None:
+    """Discard a broken pool, unless another thread has already replaced it."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+@cache
+def _styles() -> dict[str, ParagraphStyle]:
+    """Build the paragraph styles, once per process."""
+    styles = getSampleStyleSheet()
+    label_style = ParagraphStyle(
+        "label",
+        parent=styles["BodyText"],
+        fontSize=10,
+        leading=13,
+        spaceAfter=0,
+        spaceBefore=2,
+        leftIndent=0,
+        rightIndent=6,
+        textColor=colors.black,
+        wordWrap="LTR",
+        bold=True,
+    )
+    value_style = ParagraphStyle(
+        "value",
+        parent=styles["BodyText"],
+        fontSize=10,
+        leading=13,
+        spaceAfter=0,
+        spaceBefore=2,
+    )
+    title_value_style = ParagraphStyle(
+        "title_value",
+        parent=value_style,
+        fontSize=11,
+        leading=14,
+        spaceBefore=0,
+        spaceAfter=2,
+        bold=True,
+    )
+    return {
+        'label': label_style,
+        'value': value_style,
+        'title_value': title_value_style,
+    }
+
+
+def _get_person(person):
+    """Return (name, affiliation, email, orcid) for a creator / contributor"""
+    name        = person.get("name", "N/A")
+    affiliation = "N/A"
+    email       = "N/A"
+    orcid       = "N/A"
+
+    for aff in person.get("affiliation", []):
+        # Example format:  "Oceans and Coastal Research … , email: foo@bar"
+        if "email:" in aff["affiliation"]:
+            affiliation, email = map(str.strip, aff["affiliation"].split(", email:"))
+        else:
+            affiliation = aff["affiliation"]
+
+    for idf in person.get("nameIdentifiers", []):
+        if idf.get("nameIdentifierScheme") == "ORCID":
+            orcid = idf["nameIdentifier"]
+
+    return name, affiliation, email, orcid
+
+
+def _metadata_table(record: dict) -> Table:
+    # ------------------------------------------------------------------
+    # 1. -------- Extract pieces we need --------------------------------
+    # ------------------------------------------------------------------
+    meta         = record["metadata_records"][0]["metadata"]
+
+    # High‑level fields
+    title        = meta["titles"][0]["title"]
+    doi          = meta["doi"]
+    publisher    = meta["publisher"]
+    pub_year     = meta["publicationYear"]
+    keywords     = ", ".join(record["keywords"])
+
+    abstract     = meta["descriptions"][0]["description"]
+    t_start      = datetime.fromisoformat(record["temporal_start"]).strftime("%d %b %Y")
+    t_end        = datetime.fromisoformat(record["temporal_end"]).strftime("%d %b %Y")
+
+    geo_box      = meta["geoLocations"][0]["geoLocationBox"]
+    geo_str      = (
+        f"North: {geo_box['northBoundLatitude']}\n"
+        f"South: {geo_box['southBoundLatitude']}\n"
+        f"West: {geo_box['westBoundLongitude']}\n"
+        f"East: {geo_box['eastBoundLongitude']}"
+    )
+
+    creator      = meta["creators"][0]
+    contributor  = meta["contributors"][0]
+    cr_name, cr_aff, cr_email, cr_orcid = _get_person(creator)
+    c_name,  c_aff,  c_email,  c_orcid  = _get_person(contributor)
+
+    licence      = meta["rightsList"][0]
+    licence_txt  = (
+        f'<link href="{licence["rightsURI"]}">{licence["rights"]}</link>'
+    )
+
+    # ------------------------------------------------------------------
+    # 2. -------- Paragraph & table styles ------------------------------
+    # ------------------------------------------------------------------
+    styles            = _styles()
+    label_style       = styles["label"]
+    value_style       = styles["value"]
+    title_value_style = styles["title_value"]
+
+    # ------------------------------------------------------------------
+    # 3. -------- Build the table rows ----------------------------------
+    # ------------------------------------------------------------------
+    rows = [
+        [Paragraph("Title",   label_style),
+         Paragraph(title,     title_value_style)],
+
+
+        [Paragraph("DOI", label_style),
+         Paragraph(f'<link href="https://doi.org/{doi}">https://doi.org/{doi}</link>', value_style)],
+
+        [Paragraph("Authors", label_style),
+         Paragraph(f"{cr_name}<br/>{cr_aff}, email: {cr_email}", value_style)],
+
+        [Paragraph("Publisher", label_style),
+         Paragraph(f"{publisher} ({pub_year})", value_style)],
+
+        [Paragraph("Contributors", label_style),
+         Paragraph(
+             f"Contact Person: {c_name}<br/>{c_aff},<br/>email: {c_email}",
+             value_style,
+         )],
+
+        [Paragraph("Abstract", label_style),
+         Paragraph(abstract, value_style)],
+
+        [Paragraph("Data", label_style),
+         Paragraph(licence_txt, value_style)],
+
+        [Paragraph("Temporal extent", label_style),
+         Paragraph(f"{t_start} – {t_end}", value_style)],
+
+        [Paragraph("Geographic extent", label_style),
+         Paragraph(geo_str.replace("\n", "<br/>"), value_style)],
+
+        [Paragraph("Keywords", label_style),
+         Paragraph(keywords, value_style)],
+    ]
+
+    # ------------------------------------------------------------------
+    # 4. -------- Assemble the table ------------------------------------
+    # ------------------------------------------------------------------
+    table = Table(
+        rows,
+        colWidths=[1.6 * inch, 5.3 * inch],  # narrow label / wide value
+        hAlign="LEFT",
+        repeatRows=0,
+    )
+
+    # Grey horizontal rule beneath every row
+    tbl_style = [
+        ("VALIGN",    (0, 0), (-1, -1), "TOP"),
+        ("TOPPADDING",(0, 0), (-1, -1), 2),
+        ("BOTTOMPADDING",(0, 0), (-1, -1), 4),
+        ("LINEBELOW", (0, 0), (-1, 0), 0.25, colors.lightgrey),
+    ]
+    # add LINEBELOW for every subsequent row
+    for r in range(1, len(rows)):
+        tbl_style.append(("LINEBELOW", (0, r), (-1, r), 0.25, colors.lightgrey))
+
+    table.setStyle(TableStyle(tbl_style))
+    return table
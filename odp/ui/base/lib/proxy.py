@@ -0,0 +1,74 @@
+from urllib.parse import urlsplit
+
+import requests
+from flask import Response
+from werkzeug.datastructures import Headers
+
+FORWARD_REQUEST_HEADERS = (
+    'Range',
+    'If-Range',
+    'If-None-Match',
+    'If-Modified-Since',
+)
+
+FORWARD_RESPONSE_HEADERS = (
+    'Accept-Ranges',
+    'Content-Disposition',
+    'Content-Length',
+    'Content-Range',
+    'ETag',
+    'Last-Modified',
+)
+
+
+def is_allowed_host(url: str, allowed_hosts: list[str]) -> bool:
+    """Check that `url` is an http(s) URL on one of `allowed_hosts`."""
+    parts = urlsplit(url)
+    return parts.scheme in ('http', 'https') and parts.hostname in allowed_hosts
+
+
+def stream_response(
+        session: requests.Session,
+        url: str,
+        request_headers: Headers,
+        *,
+        chunk_size: int,
+        timeout: tuple[float, float],
+) -> Response:
+    """Proxy a GET request for `url`, streaming the upstream response body
+    through to the client `chunk_size` bytes at a time, so that memory use
+    is independent of the size of the upstream file.
+
+    Range and conditional request headers are forwarded upstream, and
+    the headers needed for resumable downloads are passed back.
+
+    Raises `requests.RequestException` if the upstream connection fails.
+    """
+    headers = {
+        header: value
+        for header in FORWARD_REQUEST_HEADERS
+        if (value := request_headers.get(header))
+    }
+    # ask for the file as stored, so that Content-Length and Content-Range
+    # describe exactly the bytes we pass through
+    headers['Accept-Encoding'] = 'identity'
+
+    upstream = session.get(url, headers=headers, stream=True, timeout=timeout)
+
+    def generate():
+        try:
+            yield from upstream.iter_content(chunk_size)
+        finally:
+            upstream.close()
+
+    return Response(
+        generate(),
+        status=upstream.status_code,
+        content_type=upstream.headers.get('Content-Type', 'application/octet-stream'),
+        headers={
+            header: value
+            for header in FORWARD_RESPONSE_HEADERS
+            if (value := upstream.headers.get(header))
+        },
+        direct_passthrough=True,
+    )
@@ -0,0 +1,133 @@
+import hashlib
+import re
+import zlib
+from dataclasses import asdict, dataclass
+from typing import Iterator
+
+from odp.ui.base import redis_cache
+from odp.ui.base.lib.cache import RedisCache
+from odp.ui.base.lib.catalog_search import cached_catalog_stamp, fetch_catalog
+
+URL_LIMIT = 50000
+"""Maximum number of URLs in a sitemap, per the sitemap protocol."""
+
+BLOCK_SIZE = 1000
+"""Number of URLs stored per Redis key, and streamed at a time."""
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+sitemap_cache = RedisCache(redis_cache, 'catalog', 'sitemap')
+
+
+@dataclass
+class Sitemap:
+    """A catalog's sitemap, split into blocks of URL entries held in Redis.
+
+    The sitemap published by the API is split into chunks of at most
+    `URL_LIMIT` URLs; if there is more than one chunk, `/sitemap.xml`
+    serves a sitemap index referring to them.
+    """
+
+    catalog_id: str
+    stamp: str
+    etag: str
+    urlset_tag: str
+    url_count: int
+
+    @property
+    def chunk_count(self) -> int:
+        return max(1, -(-self.url_count // URL_LIMIT))
+
+    @property
+    def is_index(self) -> bool:
+        return self.chunk_count > 1
+
+    @classmethod
+    def get(cls, catalog_id: str, expiry: int) -> 'Sitemap | None':
+        """Return the sitemap for a catalog, rebuilding it from the API
+        if the catalog has been published since it was cached. Return
+        None if the catalog has no sitemap.
+
+        When the catalog stamp has expired, the catalog object fetched to
+        renew it also serves to rebuild the sitemap, so a sitemap request
+        costs at most one API call. That the catalog has no sitemap is
+        cached too, under the same stamp.
+        """
+        state = sitemap_cache.jget(catalog_id)
+        if (stamp := cached_catalog_stamp(catalog_id)) is None or not state or state['stamp'] != stamp:
+            catalog = fetch_catalog(catalog_id)
+            stamp = catalog.get('timestamp') or ''
+            if not state or state['stamp'] != stamp:
+                try:
+                    sitemap_xml = catalog['data']['sitemap.xml']
+                except (KeyError, TypeError):
+                    state = {'stamp': stamp}
+                    sitemap_cache.jset(catalog_id, value=state, expiry=expiry)
+                else:
+                    return cls.build(catalog_id, stamp, sitemap_xml, expiry)
+
+        # a state without an etag records that there is no sitemap
+        return cls(**state) if 'etag' in state else None
+
+    @classmethod
+    def build(cls, catalog_id: str, stamp: str, sitemap_xml: str, expiry: int) -> 'Sitemap':
+        """Split a sitemap into blocks and cache them, along with the
+        sitemap state, in a single pipelined round trip."""
+        urlset_tag = match.group(0) if (match := re.search(r'<urlset\b[^>]*>', sitemap_xml)) \
+            else f'<urlset xmlns="{SITEMAP_NS}">'
+        urls = re.findall(r'<url\b.*?</url>', sitemap_xml, re.DOTALL)
+
+        sitemap = cls(
+            catalog_id=catalog_id,
+            stamp=stamp,
+            etag=hashlib.sha256(sitemap_xml.encode()).hexdigest()[:32],
+            urlset_tag=urlset_tag,
+            url_count=len(urls),
+        )
+        blocks = {
+            (catalog_id, sitemap.etag, str(n)): '\n'.join(urls[i:i + BLOCK_SIZE])
+            for n, i in enumerate(range(0, len(urls), BLOCK_SIZE))
+        }
+        # blocks outlive the state that refers to them, so that responses
+        # being streamed when the sitemap is rebuilt can complete
+        sitemap_cache.mset(blocks, expiry=expiry + 3600)
+        sitemap_cache.jset(catalog_id, value=asdict(sitemap), expiry=expiry)
+
+        return sitemap
+
+    def iter_chunk(self, chunk: int) -> Iterator[str]:
+        """Generate the XML of a chunk of the sitemap, a block at a time."""
+        yield XML_DECLARATION
+        yield self.urlset_tag
+        yield '\n'
+        first_block = chunk * URL_LIMIT // BLOCK_SIZE
+        last_block = min((chunk + 1) * URL_LIMIT, self.url_count)
+        for n in range(first_block, -(-last_block // BLOCK_SIZE)):
+            if (block := sitemap_cache.get(self.catalog_id, self.etag, str(n))) is None:
+                raise RuntimeError(f'Sitemap block {n} of catalog {self.catalog_id} has expired')
+            yield block
+            yield '\n'
+        yield '</urlset>\n'
+
+    def iter_index(self, chunk_urls: list[str]) -> Iterator[str]:
+        """Generate the XML of a sitemap index referring to the chunks."""
+        yield XML_DECLARATION
+        yield f'<sitemapindex xmlns="{SITEMAP_NS}">\n'
+        for url in chunk_urls:
+            yield f'<sitemap><loc>{url}</loc></sitemap>\n'
+        yield '</sitemapindex>\n'
+
+
+def encode(xml: Iterator[str], use_gzip: bool) -> Iterator[bytes]:
+    """Encode streamed XML, compressing it on the fly if `use_gzip`."""
+    if not use_gzip:
+        for part in xml:
+            yield part.encode()
+        return
+
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for part in xml:
+        if data := compressor.compress(part.encode()):
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,292 @@
+import hashlib
+import logging
+import os
+import secrets
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable
+
+from flask import current_app
+
+from odp.ui.base import redis_cache
+from odp.ui.base.lib.cache import RedisCache
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 65536
+"""Number of bytes read from a chunk stream at a time."""
+
+UPLOAD_EXPIRY = 86400
+"""Seconds for which an idle upload may still be resumed."""
+
+APPEND_LOCK_EXPIRY = 60
+"""Seconds for which an append holds an upload's lock without renewing it.
+The lock is renewed while the chunk is being written."""
+
+COMMIT_LOCK_EXPIRY = 300
+"""Seconds for which a commit holds an upload's commit lock without
+renewing it. The lock is renewed while the commit runs, so a commit whose
+lock has expired has died with its worker."""
+
+upload_cache = RedisCache(redis_cache, 'ChunkedUpload')
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    def __init__(self, status_code: int, message: str) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+@dataclass
+class ChunkedUpload:
+    """State of a chunked file upload to a package.
+
+    Chunks are appended to a spool file in UPLOAD_CHUNK_DIR (which must be
+    shared by all workers serving the app), and the upload state is kept in
+    Redis so that any worker may accept the next chunk.
+
+    Once complete, the upload is committed in the background: the spool
+    file is checksummed and sent on to the archive, while the client polls
+    the upload's status.
+    """
+
+    id: str
+    package_id: str
+    user_id: str
+    filename: str
+    size: int
+    unpack: bool
+    title: str | None
+    description: str | None
+    offset: int = 0
+    status: str = 'uploading'
+    """One of 'uploading', 'committing', 'done' or 'failed'."""
+    error: str | None = None
+
+    @property
+    def path(self) -> Path:
+        return _spool_dir() / f'odp-upload-{self.id}'
+
+    @property
+    def complete(self) -> bool:
+        return self.offset == self.size
+
+    @classmethod
+    def create(cls, **kwargs) -> 'ChunkedUpload':
+        upload = cls(id=secrets.token_urlsafe(16), **kwargs)
+        upload.path.touch(exist_ok=False)
+        upload.save()
+        return upload
+
+    @staticmethod
+    def sweep() -> None:
+        """Remove spool files of uploads that can no longer be resumed."""
+        expired = time.time() - UPLOAD_EXPIRY
+        for path in _spool_dir().glob('odp-upload-*'):
+            try:
+                if path.stat().st_mtime < expired:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def load(cls, upload_id: str) -> 'ChunkedUpload | None':
+        """Load the state of an upload. An upload whose commit has died is
+        reported as failed, which allows the commit to be retried."""
+        state = upload_cache.jget(upload_id)
+        if state and state['status'] == 'committing' and upload_cache.get(upload_id, 'commit') is None:
+            # the commit may have finished since we read the state; if
+            # not, its worker has died
+            if (state := upload_cache.jget(upload_id)) and state['status'] == 'committing':
+                state |= dict(status='failed', error='The upload was interrupted')
+
+        if state:
+            return cls(**state)
+
+    def save(self) -> None:
+        upload_cache.jset(self.id, value=asdict(self), expiry=UPLOAD_EXPIRY)
+
+    def append(self, stream: BinaryIO, offset: int, sha256: str, max_size: int) -> None:
+        """Append a chunk read from `stream` to the spool file.
+
+        The chunk is read and written in small blocks, and its SHA-256
+        checksum is verified before the upload offset is advanced. On any
+        failure the spool file is truncated back to the last acknowledged
+        chunk, so that the client may resume from `self.offset`.
+        """
+        lock_key = (self.id, 'lock')
+        lock_token = secrets.token_hex(8)
+        if not upload_cache.add(*lock_key, value=lock_token, expiry=APPEND_LOCK_EXPIRY):
+            raise UploadError(409, 'Another chunk is being appended')
+
+        def renew_lock():
+            if not upload_cache.extend(*lock_key, value=lock_token, expiry=APPEND_LOCK_EXPIRY):
+                raise LockLost
+
+        try:
+            # another worker may have advanced the upload since we loaded it
+            if state := upload_cache.jget(self.id):
+                self.offset = state['offset']
+                self.status = state['status']
+
+            if self.status != 'uploading':
+                raise UploadError(409, 'The upload is already being committed')
+
+            if offset != self.offset:
+                raise UploadError(409, f'Expecting a chunk at offset {self.offset}')
+
+            hasher = hashlib.sha256()
+            length = 0
+            renew_at = time.monotonic() + APPEND_LOCK_EXPIRY / 3
+            with open(self.path, 'r+b') as f:
+                f.seek(offset)
+                try:
+                    while block := stream.read(READ_SIZE):
+                        length += len(block)
+                        if length > max_size or offset + length > self.size:
+                            raise UploadError(413, 'Chunk too large')
+                        hasher.update(block)
+                        f.write(block)
+                        if time.monotonic() >= renew_at:
+                            renew_lock()
+                            renew_at = time.monotonic() + APPEND_LOCK_EXPIRY / 3
+
+                    if hasher.hexdigest() != sha256.lower():
+                        raise UploadError(400, 'Chunk checksum mismatch')
+
+                    # the offset may only be advanced by the lock holder
+                    renew_lock()
+
+                except LockLost:
+                    # another append may now be writing at this offset,
+                    # so leave the file alone
+                    raise UploadError(409, 'The upload lock expired; please resend the chunk')
+
+                except BaseException:
+                    f.truncate(offset)
+                    raise
+
+            self.offset += length
+            self.save()
+
+        finally:
+            upload_cache.release(*lock_key, value=lock_token)
+
+    def commit(self, send: Callable[[BinaryIO, str], None]) -> bool:
+        """Start committing a complete upload in the background, unless it
+        is already being committed or has been committed; return whether
+        the commit was started. A failed commit may be retried.
+
+        `send` is called on a background thread with the open spool file
+        and its SHA-256 checksum, and should send the file on to the
+        archive, raising `UploadError` if the archive rejects it.
+        """
+        lock_token = secrets.token_hex(8)
+        if not upload_cache.add(self.id, 'commit', value=lock_token, expiry=COMMIT_LOCK_EXPIRY):
+            return False
+
+        # the upload may have been committed since we loaded it; any other
+        # commit that it records has died, as we now hold the lock
+        state = upload_cache.jget(self.id)
+        if not state or state['status'] == 'done' or state['offset'] != state['size']:
+            upload_cache.release(self.id, 'commit', value=lock_token)
+            return False
+
+        self.status = 'committing'
+        self.error = None
+        self.save()
+        _get_executor().submit(self._commit, self.path, send, lock_token)
+        return True
+
+    def _commit(self, path: Path, send: Callable[[BinaryIO, str], None], lock_token: str) -> None:
+        try:
+            with _renewing_lock(self.id, 'commit', value=lock_token, expiry=COMMIT_LOCK_EXPIRY), \
+                    open(path, 'rb') as f:
+                send(f, file_sha256(f))
+
+            self.status = 'done'
+            _remove(path)
+
+        except UploadError as e:
+            self.status = 'failed'
+            self.error = e.message
+
+        except Exception:
+            logger.exception('Failed to commit upload %s', self.id)
+            self.status = 'failed'
+            self.error = 'The upload could not be completed'
+
+        # keep the spool file of a failed upload, so that the commit may be retried
+        self.save()
+        upload_cache.release(self.id, 'commit', value=lock_token)
+
+    def discard(self) -> None:
+        upload_cache.delete(self.id)
+        _remove(self.path)
+
+
+class LockLost(Exception):
+    pass
+
+
+def file_sha256(file: BinaryIO) -> str:
+    """Return the SHA-256 checksum of a file, read in small blocks from
+    its current position, and rewind the file to that position."""
+    position = file.tell()
+    hasher = hashlib.sha256()
+    while block := file.read(READ_SIZE):
+        hasher.update(block)
+    file.seek(position)
+    return hasher.hexdigest()
+
+
+@contextmanager
+def _renewing_lock(*keys: str, value: str, expiry: int):
+    """Keep renewing a lock held with the token `value` while the
+    body runs, e.g. for a commit that may outlast the lock's expiry."""
+    stop = threading.Event()
+
+    def renew():
+        while not stop.wait(expiry / 3):
+            if not upload_cache.extend(*keys, value=value, expiry=expiry):
+                logger.warning('Lost lock %s', '.'.join(keys))
+                return
+
+    thread = threading.Thread(target=renew, name='ChunkedUpload.renew', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get('UPLOAD_COMMIT_WORKERS', 2),
+                thread_name_prefix='ChunkedUpload.commit',
+            )
+    return _executor
+
+
+def _remove(path: Path) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _spool_dir() -> Path:
+    return Path(current_app.config.get('UPLOAD_CHUNK_DIR') or tempfile.gettempdir())
@@ -1,7 +1,17 @@
+import hashlib
+import json
+from typing import Mapping
+
+from flask import g
 from markupsafe import Markup
 
-from odp.const.db import KeywordStatus
-from odp.ui.base import api
+from odp.ui.base import api, redis_cache
+from odp.ui.base.lib.cache import RedisCache
+
+CHOICES_EXPIRY = 600
+"""Seconds for which choice lists are cached across requests."""
+
+choice_cache = RedisCache(redis_cache, 'choices')
 
 
 def pagify(item_list: list) -> dict:
@@ -14,8 +24,46 @@ def pagify(item_list: list) -> dict:
     }
 
 
+def get_choice_items(path: str, **params) -> list[dict]:
+    """Get the unpaginated item list for populating a choice field.
+
+    Results are memoized for the current request, and are cached in
+    Redis for `CHOICES_EXPIRY` seconds, shared by users having the same
+    permissions (as lists may be filtered by the API according to the
+    user's access). Use `invalidate_choices` when the list changes.
+    """
+    params_key = json.dumps(params, sort_keys=True, default=str)
+    memo = g.setdefault('choice_items', {})
+    if (path, params_key) in memo:
+        return memo[path, params_key]
+
+    cache_key = (path, permissions_digest(), params_key)
+    if (items := choice_cache.jget(*cache_key)) is None:
+        items = api.get(path, size=0, **params)['items']
+        choice_cache.jset(*cache_key, value=items, expiry=CHOICES_EXPIRY)
+
+    memo[path, params_key] = items
+    return items
+
+
+def invalidate_choices(path: str) -> None:
+    """Discard all cached choice lists for an API path."""
+    choice_cache.purge(path)
+    g.pop('choice_items', None)
+
+
+def permissions_digest() -> str:
+    """Return a short digest of the current user's permissions, for keying
+    cached content that varies with what the user may see."""
+    permissions = g.get('user_permissions') or {}
+    permissions = dict(permissions) if isinstance(permissions, Mapping) else sorted(permissions)
+    return hashlib.sha256(
+        json.dumps(permissions, sort_keys=True, default=str).encode()
+    ).hexdigest()[:16]
+
+
 def populate_collection_choices(field, include_none=False):
-    collections = api.get('/collection/', sort='key', size=0)['items']
+    collections = get_choice_items('/collection/', sort='key')
     field.choices = [('', '(None)')] if include_none else []
     field.choices += [
         (collection['id'], Markup(f"{collection['key']} &mdash; {collection['name']}"))
@@ -24,7 +72,7 @@ def populate_collection_choices(field, include_none=False):
 
 
 def populate_provider_choices(field, include_none=False):
-    providers = api.get('/provider/', sort='key', size=0)['items']
+    providers = get_choice_items('/provider/', sort='key')
     field.choices = [('', '(None)')] if include_none else []
     field.choices += [
         (provider['id'], Markup(f"{provider['key']} &mdash; {provider['name']}"))
@@ -33,7 +81,7 @@ def populate_provider_choices(field, include_none=False):
 
 
 def populate_metadata_schema_choices(field):
-    schemas = api.get('/schema/', schema_type='metadata', size=0)['items']
+    schemas = get_choice_items('/schema/', schema_type='metadata')
     field.choices = [
         (schema['id'], schema['id'])
         for schema in schemas
@@ -42,7 +90,7 @@ def populate_metadata_schema_choices(field):
 
 
 def populate_scope_choices(field, scope_types=None):
-    scopes = api.get('/scope/', size=0)['items']
+    scopes = get_choice_items('/scope/')
     field.choices = [
         (scope['id'], scope['id'])
         for scope in scopes
@@ -51,7 +99,7 @@ def populate_scope_choices(field, scope_types=None):
 
 
 def populate_role_choices(field, include_none=False):
-    roles = api.get('/role/', size=0)['items']
+    roles = get_choice_items('/role/')
     field.choices = [('', '(None)')] if include_none else []
     field.choices += [
         (role['id'], role['id'])
@@ -60,10 +108,8 @@ def populate_role_choices(field, include_none=False):
 
 
 def populate_keyword_choices(field, vocabulary_id, include_none=False, include_proposed=False):
-    keywords = api.get(f'/keyword/{vocabulary_id}/', size=0, include_proposed=include_proposed)
+    from odp.ui.base.lib.vocabulary import get_index
+
+    choices = get_index(vocabulary_id, include_proposed=include_proposed).choices
     field.choices = [('', '(None)')] if include_none else []
-    for keyword in keywords['items']:
-        key = keyword['key']
-        if keyword['status'] == KeywordStatus.proposed:
-            key = Markup(f'<i>{key} (pending verification)</i>')
-        field.choices += [(keyword['id'], key)]
+    field.choices += choices
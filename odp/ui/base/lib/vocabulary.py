@@ -0,0 +1,128 @@
+import re
+import secrets
+import time
+from types import MappingProxyType
+from typing import Iterable
+
+from markupsafe import Markup
+
+from odp.const.db import KeywordStatus
+from odp.ui.base import redis_cache
+from odp.ui.base.lib.cache import RedisCache
+from odp.ui.base.lib.utils import CHOICES_EXPIRY, get_choice_items, invalidate_choices, permissions_digest
+
+VERSION_CHECK_INTERVAL = 10
+"""Seconds between checks of a vocabulary's version stamp in Redis."""
+
+version_cache = RedisCache(redis_cache, 'vocabulary', 'version')
+
+_indexes: dict[tuple[str, bool, str], 'VocabularyIndex'] = {}
+"""Indexes by vocabulary id, include_proposed and permissions digest."""
+
+
+class PrefixTrie:
+    """Maps word prefixes to the ids of the entries having a word
+    that starts with the prefix."""
+
+    def __init__(self) -> None:
+        self._root = {}
+
+    def insert(self, word: str, id: int) -> None:
+        node = self._root
+        for char in word:
+            node = node.setdefault(char, {})
+            node.setdefault(None, set()).add(id)
+
+    def search(self, prefix: str) -> set[int]:
+        node = self._root
+        for char in prefix:
+            if (node := node.get(char)) is None:
+                return set()
+
+        return node.get(None, set())
+
+
+class VocabularyIndex:
+    """An in-memory index of a vocabulary's keywords, with prebuilt
+    choices for select fields and prefix search for type-ahead."""
+
+    def __init__(self, keywords: list[dict], version: str) -> None:
+        self.version = version
+        self.loaded_at = self.checked_at = time.monotonic()
+        self.keywords = MappingProxyType({keyword['id']: keyword for keyword in keywords})
+        self.choices = tuple(
+            (keyword['id'], _choice_label(keyword))
+            for keyword in keywords
+        )
+        self._trie = PrefixTrie()
+        for keyword in keywords:
+            for word in _words(keyword['key'], (keyword.get('data') or {}).get('abbr') or ''):
+                self._trie.insert(word, keyword['id'])
+
+    def choices_for(self, keyword_ids: Iterable[int | str]) -> tuple[tuple[int, str], ...]:
+        """Return the choices for the given keyword ids only."""
+        keyword_ids = {str(keyword_id) for keyword_id in keyword_ids}
+        return tuple(choice for choice in self.choices if str(choice[0]) in keyword_ids)
+
+    def complete(self, query: str, limit: int) -> list[dict]:
+        """Return up to `limit` keywords having words that start with
+        each of the words in `query`, ordered by key."""
+        if not (words := _words(query)):
+            return []
+
+        keyword_ids = set.intersection(*(self._trie.search(word) for word in words))
+        keywords = sorted(
+            (self.keywords[keyword_id] for keyword_id in keyword_ids),
+            key=lambda keyword: keyword['key'].lower(),
+        )
+        return keywords[:limit]
+
+
+def get_index(vocabulary_id: str, include_proposed: bool = False) -> VocabularyIndex:
+    """Return the index for a vocabulary, loading it if this worker has
+    not yet done so, or if the vocabulary has changed since.
+
+    As the API may filter keyword lists according to the user's access,
+    indexes are kept per set of permissions, like the lists they are
+    built from (see `get_choice_items`).
+
+    Changes made through `invalidate` are picked up within
+    `VERSION_CHECK_INTERVAL` seconds; any others (e.g. keywords approved
+    in the admin UI) within `CHOICES_EXPIRY` seconds.
+    """
+    # enum member -> value
+    vocabulary_id = f'{vocabulary_id}'
+    index_key = vocabulary_id, include_proposed, permissions_digest()
+    index = _indexes.get(index_key)
+    now = time.monotonic()
+
+    if index and now - index.checked_at < VERSION_CHECK_INTERVAL:
+        return index
+
+    version = version_cache.get(vocabulary_id) or ''
+    if index and index.version == version and now - index.loaded_at < CHOICES_EXPIRY:
+        index.checked_at = now
+        return index
+
+    keywords = get_choice_items(f'/keyword/{vocabulary_id}/', include_proposed=include_proposed)
+    _indexes[index_key] = index = VocabularyIndex(keywords, version)
+
+    return index
+
+
+def invalidate(vocabulary_id: str) -> None:
+    """Discard cached keyword lists for a vocabulary, and have all
+    workers reload their indexes for it."""
+    vocabulary_id = f'{vocabulary_id}'
+    invalidate_choices(f'/keyword/{vocabulary_id}/')
+    version_cache.set(vocabulary_id, value=secrets.token_hex(8))
+
+
+def _choice_label(keyword: dict) -> str:
+    if keyword['status'] == KeywordStatus.proposed:
+        return Markup('<i>{} (pending verification)</i>').format(keyword['key'])
+    return keyword['key']
+
+
+def _words(*texts: str) -> set[str]:
+    return {word for text in texts for word in re.findall(r'\w+', text.lower())}
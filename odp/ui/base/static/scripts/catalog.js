@@ -280,6 +280,7 @@ async function downloadSelectedRecords(event, buttonEl, record_id) {
         console.log("Selected Records:", selectedRecords);
 
         const zip = new JSZip();
+        const failedFiles = [];
 
         for (const record of selectedRecords) {
             const metadataRecord = record.metadata_records?.[0];
@@ -314,11 +315,14 @@ async function downloadSelectedRecords(event, buttonEl, record_id) {
                 try {
                     const proxyUrl = `/catalog/proxy-download?url=${encodeURIComponent(downloadURL)}`;
                     const response = await fetch(proxyUrl);
+                    if (!response.ok) throw new Error(`Proxy responded with ${response.status}`);
+
                     const blob = await response.blob();
                     const extension = blob.type.split('/')[1] || 'bin';
                     folder.file(`${fileName}.${extension}`, blob);
                 } catch (err) {
                     console.error("Error downloading via proxy:", downloadURL, err);
+                    failedFiles.push(fileName);
                 }
             }
         }
@@ -329,6 +333,10 @@ async function downloadSelectedRecords(event, buttonEl, record_id) {
         a.download = 'Records.zip';
         a.click();
 
+        if (failedFiles.length) {
+            alert(`The following files could not be downloaded and were left out of the zip:\n${failedFiles.join('\n')}`);
+        }
+
     } catch (err) {
         console.error("Download failed:", err);
         alert("Failed to download records. Please try again.");
@@ -115,6 +115,62 @@ function updateROR() {
     $('#ror-description').text(ror_url);
 }
 
+let affiliationSearchTimer;
+
+function searchAffiliations(autocompleteUrl) {
+    clearTimeout(affiliationSearchTimer);
+    affiliationSearchTimer = setTimeout(function () {
+        const results = $('#affiliation-results');
+        const query = $('#affiliation-search').val().trim();
+        if (!query) {
+            results.empty();
+            return;
+        }
+        $.getJSON(autocompleteUrl, {q: query})
+            .done(function (data) {
+                results.empty();
+                $.each(data.items, function (i, institution) {
+                    let label = institution.key;
+                    if (institution.abbr) {
+                        label += ` (${institution.abbr})`;
+                    }
+                    if (institution.proposed) {
+                        label += ' (pending verification)';
+                    }
+                    const item = $('<button type="button" class="list-group-item list-group-item-action">');
+                    item.text(label);
+                    item.on('click', function () {
+                        addAffiliation(institution.id, label);
+                        results.empty();
+                        $('#affiliation-search').val('');
+                    });
+                    results.append(item);
+                });
+            })
+            .fail(function (jqxhr, textStatus, error) {
+                alert(`${textStatus}: ${error}`);
+            });
+    }, 250);
+}
+
+function addAffiliation(id, label) {
+    const existing = $(`#affiliations input[value="${id}"]`);
+    if (existing.length) {
+        existing.prop('checked', true);
+        return;
+    }
+    const li = $('<li>');
+    const checkbox = $(`<input type="checkbox" name="affiliations" checked>`);
+    checkbox.attr('id', `affiliations-${id}`);
+    checkbox.val(id);
+    const labelElem = $(`<label for="affiliations-${id}">`);
+    labelElem.text(label);
+    li.append(checkbox);
+    li.append(' ');
+    li.append(labelElem);
+    $('#affiliations').append(li);
+}
+
 function selectGeoShape() {
     const isPoint = $('input[type="radio"][value="point"]').is(':checked');
     const isRegion = $('input[type="radio"][value="box"]').is(':checked');
@@ -137,31 +193,144 @@ function selectGeoShape() {
 }
 
 
-async function fileSelected(zip = false) {
-    /* Update file/zip upload form with file size, content type
-     * and SHA-256 hash computed from the selected input file.
-     *
-     * Adapted from https://developer.mozilla.org/en-US/docs/Web/API/Web_Crypto_API/Non-cryptographic_uses_of_subtle_crypto
+function fileSelected(zip = false) {
+    /* Update file/zip upload form with the size and content type
+     * of the selected input file.
      */
     zip = zip ? 'zip_' : '';
     const file = $(`#${zip}file`).prop('files')[0];
-    const arrayBuffer = await file.arrayBuffer();
+    $(`#${zip}size`).val(file.size);
+    $(`#${zip}mimetype`).val(file.type);
+}
+
+
+function initChunkedUploads(uploadUrl) {
+    /* Send file/zip uploads in checksummed chunks, resuming an
+     * interrupted upload of the same file from the last chunk that
+     * was acknowledged by the server.
+     */
+    $('#upload-file-form').on('submit', function (event) {
+        event.preventDefault();
+        chunkedUpload(uploadUrl, this, false);
+    });
+    $('#upload-zip-form').on('submit', function (event) {
+        event.preventDefault();
+        chunkedUpload(uploadUrl, this, true);
+    });
+}
+
+
+async function sha256Hex(arrayBuffer) {
     const hashAsArrayBuffer = await crypto.subtle.digest("SHA-256", arrayBuffer);
-    const uint8ViewOfHash = new Uint8Array(hashAsArrayBuffer);
-    const hashAsString = Array.from(uint8ViewOfHash)
+    return Array.from(new Uint8Array(hashAsArrayBuffer))
         .map((b) => b.toString(16).padStart(2, "0"))
         .join("");
+}
 
-    $(`#${zip}size`).val(file.size);
-    $(`#${zip}mimetype`).val(file.type);
-    $(`#${zip}sha256`).val(hashAsString);
+
+async function chunkedUpload(uploadUrl, form, zip) {
+    const prefix = zip ? 'zip_' : '';
+    const file = $(`#${prefix}file`).prop('files')[0];
+    if (!file || !form.reportValidity()) {
+        return;
+    }
+    const csrfToken = $(form).find('input[name="csrf_token"]').val();
+    const resumeKey = `upload:${uploadUrl}:${zip}:${file.name}:${file.size}:${file.lastModified}`;
+    const submitBtn = $(`button[form="${form.id}"]`);
+    submitBtn.prop('disabled', true);
+
+    try {
+        let upload = null;
+        const resumeId = localStorage.getItem(resumeKey);
+        if (resumeId) {
+            const response = await fetch(`${uploadUrl}/${resumeId}`);
+            if (response.ok) {
+                upload = await response.json();
+            }
+        }
+        if (!upload) {
+            const data = new FormData();
+            data.append('csrf_token', csrfToken);
+            data.append('filename', file.name);
+            data.append('size', file.size);
+            data.append('mimetype', file.type);
+            if (zip) {
+                data.append('unpack', 'y');
+            } else {
+                data.append('title', $(form).find('[name="title"]').val());
+                data.append('description', $(form).find('[name="description"]').val());
+            }
+            const response = await fetch(uploadUrl, {method: 'POST', body: data});
+            if (!response.ok) {
+                throw new Error(JSON.stringify((await response.json()).errors));
+            }
+            upload = await response.json();
+            localStorage.setItem(resumeKey, upload.upload_id);
+        }
+
+        let offset = upload.offset;
+        let retries = 0;
+        while (upload.status === 'uploading' && offset < file.size) {
+            const chunk = await file.slice(offset, offset + upload.chunk_size).arrayBuffer();
+            const chunkUrl = `${uploadUrl}/${upload.upload_id}/chunk?offset=${offset}&sha256=${await sha256Hex(chunk)}`;
+            const response = await fetch(chunkUrl, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/octet-stream', 'X-CSRFToken': csrfToken},
+                body: chunk,
+            });
+            const result = await response.json();
+            if (response.ok) {
+                retries = 0;
+            } else if (++retries > 5) {
+                throw new Error(result.error || JSON.stringify(result.errors));
+            }
+            offset = result.offset;
+        }
+
+        if (upload.status === 'uploading' || upload.status === 'failed') {
+            const data = new FormData();
+            data.append('csrf_token', csrfToken);
+            const response = await fetch(`${uploadUrl}/${upload.upload_id}/commit`, {method: 'POST', body: data});
+            upload = await response.json();
+            if (!response.ok) {
+                throw new Error(upload.error || JSON.stringify(upload.errors));
+            }
+        }
+
+        // the upload is sent on to the archive in the background; wait for the outcome
+        while (!upload.redirect) {
+            if (upload.status === 'failed') {
+                throw new Error(upload.error);
+            }
+            await new Promise((resolve) => setTimeout(resolve, 2000));
+            const response = await fetch(`${uploadUrl}/${upload.upload_id}`);
+            if (response.ok) {
+                upload = await response.json();
+            } else if (response.status === 404) {
+                throw new Error('The upload has expired');
+            }
+        }
+
+        localStorage.removeItem(resumeKey);
+        const target = new URL(upload.redirect, location.href);
+        const reload = target.pathname === location.pathname && target.search === location.search;
+        location.assign(target);
+        if (reload) {
+            // only the hash has changed, so the page must be reloaded explicitly
+            location.reload();
+        }
+
+    } catch (err) {
+        alert(`Upload failed: ${err.message}. Submit again to resume the upload.`);
+        submitBtn.prop('disabled', false);
+    }
 }
 
 
 let sdgVocab;
 
-function loadSDGVocabulary() {
-    $.getJSON("/vocabulary/SDG")
+function loadSDGVocabulary(vocabularyUrl) {
+    $.getJSON(vocabularyUrl)
         .done(function (data) {
             sdgVocab = data;
             populateSDGs();
@@ -5,17 +5,68 @@ from datetime import datetime
 from enum import Enum
 from functools import partial
 from pathlib import Path
-from random import randint
 from typing import Any
 from zoneinfo import ZoneInfo
 
-from flask import Flask
+import click
+from flask import Flask, g
+from jinja2 import FileSystemBytecodeCache, TemplateError
 
 from odp.const import DOI_REGEX, ODPMetadataSchema
+from odp.ui.base.lib.cache import RedisCache
+from odp.ui.base.templates.fragment_cache import FragmentCacheExtension
+
+TEMPLATE_EXTENSIONS = ('html', 'j2', 'xml')
 
 
 def init_app(app: Flask):
-    """Set up common template filters."""
+    """Set up common template filters, and the fragment cache. Fragment
+    caching is enabled by default except in debug mode, and may be
+    configured with TEMPLATE_FRAGMENT_CACHE.
+
+    If TEMPLATE_CACHE_DIR is configured, compiled templates are kept there
+    and shared by all workers; it may be populated at deploy time with
+    `flask compile-templates`. Templates are then only checked for changes
+    if TEMPLATES_AUTO_RELOAD is set, or in debug mode.
+    """
+    if cache_dir := app.config.get('TEMPLATE_CACHE_DIR'):
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(str(cache_dir))
+
+    @app.cli.command('compile-templates')
+    def compile_templates():
+        """Compile all templates into TEMPLATE_CACHE_DIR."""
+        if app.jinja_env.bytecode_cache is None:
+            raise click.ClickException('TEMPLATE_CACHE_DIR is not configured')
+
+        app.jinja_env.bytecode_cache.clear()
+        errors = 0
+        for name in app.jinja_env.list_templates(extensions=TEMPLATE_EXTENSIONS):
+            try:
+                app.jinja_env.get_template(name)
+            except TemplateError as e:
+                click.echo(f'{name}: {e}', err=True)
+                errors += 1
+
+        if errors:
+            raise click.ClickException(f'{errors} template(s) failed to compile')
+
+        click.echo(f'Compiled templates into {app.config["TEMPLATE_CACHE_DIR"]}')
+
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    if app.config.get('TEMPLATE_FRAGMENT_CACHE', not app.debug):
+        from odp.ui.base import redis_cache
+
+        # fragments are kept apart per app and catalog, which may render
+        # the same keys differently, and are discarded on upgrade, in case
+        # the templates changed
+        app.jinja_env.fragment_cache = RedisCache(
+            redis_cache,
+            'fragment',
+            app.name,
+            app.config.get('CATALOG_ID') or '',
+            app.config['ODP_VERSION'],
+        )
 
     @app.template_filter()
     def bytes(value: int, verbose=False) -> str:
@@ -86,28 +137,18 @@ def init_app(app: Flask):
 
     @app.template_filter()
     def keyword(keyword_id: int) -> dict:
-        """Return the keyword object for a keyword code.
-        The cli client must have scope `odp.keyword:read_all`.
-        This will fail horrifically if there is an API error.
-        """
-        from odp.ui.base import cli
-
-        if cached_kw_obj := cli.cache.jget('keyword', str(keyword_id)):
-            return cached_kw_obj
+        """Return the keyword object for a keyword id.
 
-        kw_obj = cli.get(f'/keyword/{keyword_id}')
-
-        # For keywords awaiting approval, expire quickly, otherwise keep
-        # cached for between 7 and 14 days. Keyword objects will rarely
-        # change, but we must expire them in case they ever do.
-        if kw_obj['status'] == 'proposed':
-            expiry = 3600
-        else:
-            expiry = randint(604800, 1209600)
+        Keywords are normally looked up in the per-request dictionary
+        populated by `resolve_keywords` before rendering; a keyword that
+        was not resolved in advance is resolved on demand.
+        """
+        from odp.ui.base.lib.keywords import resolve_keywords
 
-        cli.cache.jset('keyword', str(keyword_id), value=kw_obj, expiry=expiry)
+        if keyword_id not in g.get('keywords', {}):
+            resolve_keywords([keyword_id])
 
-        return kw_obj
+        return g.keywords[keyword_id]
 
     @app.template_filter()
     def folder(path: str) -> str:
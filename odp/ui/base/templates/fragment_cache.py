@@ -0,0 +1,50 @@
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+
+class FragmentCacheExtension(Extension):
+    """Adds a block tag for caching rendered template fragments::
+
+        {% cache ('catalog-record', record.id, record.timestamp), 86400 %}
+            ...
+        {% endcache %}
+
+    The key may be a single value or a tuple of values, and must identify
+    everything that the content of the block depends on. The second
+    argument is the expiry in seconds.
+
+    Caching is enabled by setting `environment.fragment_cache` to a
+    `RedisCache`; otherwise the block is rendered as if the tag were absent.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = parser.parse_expression()
+        parser.stream.expect('comma')
+        expiry = parser.parse_expression()
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+
+        return nodes.CallBlock(
+            self.call_method('_render', [nodes.ContextReference(), key, expiry]),
+            [], [], body,
+        ).set_lineno(lineno)
+
+    def _render(self, context, key, expiry, caller):
+        if (cache := self.environment.fragment_cache) is None:
+            return caller()
+
+        keys = tuple(str(k) for k in key) if isinstance(key, (tuple, list)) else (str(key),)
+
+        if (content := cache.get(*keys)) is None:
+            content = caller()
+            cache.set(*keys, value=str(content), expiry=expiry)
+            return content
+
+        return Markup(content) if context.eval_ctx.autoescape else content
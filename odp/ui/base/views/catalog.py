@@ -1,28 +1,32 @@
 import json
+import logging
+import re
+from functools import partial
 from pathlib import Path
 from random import randint
-from typing import Optional
+from typing import Iterable, Optional
 
-from flask import Blueprint, abort, current_app, make_response, redirect, render_template, request, url_for,Response,jsonify,send_file
+from flask import Blueprint, abort, current_app, g, make_response, redirect, render_template, request, session, url_for,Response,jsonify,send_file
+from flask_login import current_user
 from io import BytesIO
-from datetime import datetime
 import json
 
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer,Table, TableStyle
-from reportlab.lib.units import inch
-
 from odp.config import config
-from odp.const import ODPMetadataSchema
+from odp.const import DOI_REGEX, ODPMetadataSchema
 from odp.lib.client import ODPAPIError
-from odp.ui.base import api, cli
+from odp.ui.base import api, cli, redis_cache, transport
 from odp.ui.base.forms import CatalogSearchForm
+from odp.ui.base.lib import caching, catalog_search, proxy
+from odp.ui.base.lib.cache import RedisCache
+from odp.ui.base.lib.pdf import render_metadata_pdf
+from odp.ui.base.lib.sitemap import Sitemap, encode
+from odp.ui.base.lib.utils import permissions_digest
 
 import requests
 
 
+logger = logging.getLogger(__name__)
+
 bp = Blueprint(
     'catalog', __name__,
     static_folder=Path(__file__).parent.parent / 'static',
@@ -31,29 +35,83 @@ bp = Blueprint(
 client_id = api.client_id.split('.')[0]
 
 
+title_cache = RedisCache(redis_cache, cli.__class__.__name__, cli.client_id)
+
+record_version_cache = RedisCache(redis_cache, 'catalog', 'record_version')
+
+proxy_session = transport.session()
+
+
 @bp.app_template_filter()
 def doi_title(doi: str) -> str:
-    """Get the title for the given DOI."""
-    if cached_title := cli.cache.get(doi, 'title'):
-        return cached_title
+    """Get the title for the given DOI.
 
-    catalog_id = current_app.config['CATALOG_ID']
-    try:
-        if title := cli.get(
-                f'/catalog/{catalog_id}/getvalue/{doi}',
-                schema_id=ODPMetadataSchema.SAEON_DATACITE4,
-                json_pointer='/titles/0/title',
-        ):
-            # titles rarely change, but we must expire them in case they ever do;
-            # keep for between 7 and 14 days, so a large set of child record titles doesn't expire all at once
-            cli.cache.set(doi, 'title', value=title, expiry=randint(604800, 1209600))
+    Titles are read from the per-request dictionary populated by
+    `resolve_doi_titles`. A DOI that has not been resolved is resolved on
+    demand, together with any DOIs set aside in `g.deferred_dois`; so a
+    view may defer the lookups for a page, and skip them altogether if the
+    fragment that uses them is served from the cache.
+    """
+    if doi not in g.get('doi_titles', {}):
+        resolve_doi_titles(g.pop('deferred_dois', set()) | {doi})
+
+    return g.doi_titles[doi]
 
-            return title
 
+def resolve_doi_titles(dois: Iterable[str]) -> None:
+    """Resolve the titles for a set of DOIs into `g.doi_titles`.
+
+    Cached titles are fetched from Redis in a single round trip. Titles
+    that are not cached are fetched from the API concurrently (bounded by
+    the client's thread pool), and are written back to the cache in a
+    single pipelined round trip.
+    """
+    dois = sorted(set(dois))
+    titles = dict(zip(dois, title_cache.mget((doi, 'title') for doi in dois)))
+
+    if misses := [doi for doi, title in titles.items() if title is None]:
+        catalog_id = current_app.config['CATALOG_ID']
+        fetched = dict(zip(misses, cli.gather(*(
+            partial(_fetch_doi_title, catalog_id, doi) for doi in misses
+        ))))
+
+        # titles rarely change, but we must expire them in case they ever do;
+        # keep for between 7 and 14 days, so a large set of child record titles doesn't expire all at once
+        title_cache.mset(
+            {(doi, 'title'): title for doi, title in fetched.items() if title},
+            expiry=lambda _: randint(604800, 1209600),
+        )
+        titles |= fetched
+
+    g.doi_titles = g.get('doi_titles', {}) | {
+        doi: title or '' for doi, title in titles.items()
+    }
+
+
+def _fetch_doi_title(catalog_id: str, doi: str) -> str | None:
+    try:
+        return cli.get(
+            f'/catalog/{catalog_id}/getvalue/{doi}',
+            schema_id=ODPMetadataSchema.SAEON_DATACITE4,
+            json_pointer='/titles/0/title',
+        )
     except ODPAPIError:
         pass
 
-    return ''
+
+def _related_dois(record: dict) -> set[str]:
+    """Return the related DOIs for which `catalog_record.html` renders
+    a title; see the `_render_related_identifier` macro."""
+    dois = set()
+    if datacite_metadata := select_datacite_metadata(record):
+        for related_id in datacite_metadata.get('relatedIdentifiers') or ():
+            if related_id.get('relatedIdentifierType') != 'DOI':
+                continue
+            if (match := re.search(DOI_REGEX[1:], related_id.get('relatedIdentifier', ''))) and \
+                    (doi := match.group(0)).startswith('10.15493'):
+                dois.add(doi)
+
+    return dois
 
 
 def _select_metadata(record: dict, schema_id: ODPMetadataSchema) -> Optional[dict]:
@@ -118,8 +176,7 @@ def index():
             facet_api_query[facet_title] = facet_value
             facet_ui_query[facet_field] = facet_value
 
-    result = cli.get(
-        f'/catalog/{catalog_id}/search',
+    search_params = dict(
         text_query=text_query,
         facet_query=json.dumps(facet_api_query),
         north_bound=north_bound,
@@ -131,9 +188,14 @@ def index():
         exclusive_region=exclusive_region,
         exclusive_interval=exclusive_interval,
         sort=sort,
-        page=page,
-        size=25,
+        size=current_app.config.get('CATALOG_PAGE_SIZE', 25),
     )
+    result = catalog_search.search(catalog_id, page=page, **search_params)
+
+    # warm the next page, which the user is likely to ask for
+    if current_app.config.get('CATALOG_PREFETCH') and \
+            (next_page := result.get('page', 1) + 1) <= result.get('pages', 0):
+        catalog_search.prefetch(catalog_id, page=next_page, **search_params)
 
     return render_template(
         'catalog_index.html',
@@ -166,248 +228,203 @@ def search():
 @cli.view()
 @api.user()
 def view(id):
+    """Render a catalog record page.
+
+    Responses carry a strong ETag, and a conditional request for an
+    unchanged page is answered with a 304 without rendering the page or,
+    if the record's version is cached, fetching the record. Pages for
+    anonymous users may be stored by shared caches for up to
+    CATALOG_RECORD_MAX_AGE seconds, and are tagged with a Surrogate-Key
+    so that they may be purged by record.
+    """
     catalog_id = current_app.config['CATALOG_ID']
+    max_age = current_app.config.get('CATALOG_RECORD_MAX_AGE', 300)
+
+    # a page with pending flash messages is a one-off
+    if conditional := '_flashes' not in session:
+        if current_user.is_authenticated:
+            cache_control = 'private, no-cache'
+        else:
+            cache_control = f'public, max-age={max_age}'
+
+        if (version := record_version_cache.get(catalog_id, id)) and \
+                caching.is_not_modified(etag := _record_etag(version)):
+            return caching.not_modified(etag, cache_control)
 
     record = cli.get(f'/catalog/{catalog_id}/records/{id}')
 
-    return render_template(
+    if conditional:
+        version = _record_version(record)
+        record_version_cache.set(catalog_id, id, value=version, expiry=max_age)
+        if caching.is_not_modified(etag := _record_etag(version)):
+            return caching.not_modified(etag, cache_control)
+
+    # resolved in one go when first rendered; see `doi_title`
+    g.deferred_dois = _related_dois(record)
+
+    response = make_response(render_template(
         'catalog_record.html',
         record=record,
         app_name = client_id
-    )
+    ))
+
+    if conditional:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        response.headers['Surrogate-Key'] = f'catalog-record catalog-record-{record["id"]}'
+
+    return response
+
+
+def _record_version(record: dict) -> str:
+    """Return a value that changes whenever the record does."""
+    return record.get('timestamp') or caching.etag_for(record)
+
+
+def _record_etag(version: str) -> str:
+    """Return the ETag of a record page. The page varies with the record,
+    the app version and, for a logged in user, the user's identity and
+    permissions."""
+    if current_user.is_authenticated:
+        return caching.etag_for(version, current_app.config['ODP_VERSION'], current_user.id, permissions_digest())
+
+    return caching.etag_for(version, current_app.config['ODP_VERSION'])
 
 @bp.route('/sitemap.xml')
 @cli.view()
 def sitemap():
+    """Serve the catalog sitemap or, if the catalog has more URLs than
+    a sitemap may hold, a sitemap index referring to its chunks."""
+    return _sitemap_response()
+
+
+@bp.route('/sitemap-<int:chunk>.xml')
+@cli.view()
+def sitemap_chunk(chunk):
+    return _sitemap_response(chunk)
+
+
+def _sitemap_response(chunk: int = None) -> Response:
+    """Stream a sitemap document from blocks cached in Redis, gzipped
+    if the client accepts it.
+
+    The sitemap is only fetched from the API when the catalog has
+    published since it was cached, so crawler requests are otherwise
+    served without an API round trip; and a client holding the current
+    version gets a 304.
+    """
     catalog_id = current_app.config['CATALOG_ID']
+    max_age = current_app.config.get('CATALOG_SITEMAP_MAX_AGE', 3600)
 
-    catalog = cli.get(f'/catalog/{catalog_id}')
-    try:
-        sitemap_xml = catalog['data']['sitemap.xml']
-    except (KeyError, TypeError):
+    if not (sitemap := Sitemap.get(catalog_id, current_app.config.get('CATALOG_SITEMAP_TTL', 86400))):
+        abort(404)
+
+    if chunk is None:
+        xml = sitemap.iter_index([
+            url_for('.sitemap_chunk', chunk=n, _external=True)
+            for n in range(sitemap.chunk_count)
+        ]) if sitemap.is_index else sitemap.iter_chunk(0)
+    elif sitemap.is_index and 0 <= chunk < sitemap.chunk_count:
+        xml = sitemap.iter_chunk(chunk)
+    else:
         abort(404)
 
-    response = make_response(sitemap_xml)
-    response.headers['Content-Type'] = 'application/xml'
+    use_gzip = 'gzip' in request.accept_encodings
+    etag = caching.etag_for(sitemap.etag, chunk, use_gzip)
+    cache_control = f'public, max-age={max_age}'
+
+    if caching.is_not_modified(etag):
+        response = caching.not_modified(etag, cache_control)
+    else:
+        response = Response(encode(xml, use_gzip), mimetype='application/xml')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+
+    response.vary.add('Accept-Encoding')
     return response
 
 
 @bp.route('/subset')
 @cli.view()
 def subset_record_list():
+    """List a shared selection of catalog records, a page at a time."""
     catalog_id = current_app.config['CATALOG_ID']
-    record_ids = request.args.getlist('record_id_or_doi_list')
-    record_ids_query = '&record_id_or_doi_list='.join(record_ids)
-    # Prepend the first parameter
-    record_ids_query = f"record_id_or_doi_list={record_ids_query}"
-    # Pass the record IDs as query parameters
-
-    #Add page and size on the query paramenters &page=1&size=50
-    page = 1 #request.args.getlist('page')[0]
-
-    size = 5 #request.args.getlist('size')[0]
-    catalog_record_list = cli.get(f'/catalog/{catalog_id}/subset?{record_ids_query}&page={page}&size={size}')
-    print(catalog_record_list)
-    client_id = api.client_id.split('.')[0]
+    max_size = current_app.config.get('CATALOG_SUBSET_MAX_SIZE', 100)
+
+    record_ids = list(dict.fromkeys(
+        record_id.strip()
+        for record_id in request.args.getlist('record_id_or_doi_list')
+        if record_id.strip()
+    ))
+    page = max(request.args.get('page', 1, type=int), 1)
+    size = min(max(request.args.get('size', current_app.config.get('CATALOG_PAGE_SIZE', 25), type=int), 1), max_size)
+
+    catalog_record_list = catalog_search.subset(catalog_id, record_ids, page=page, size=size)
+    logger.debug(
+        'Catalog subset: %d records, page %d of %d',
+        len(record_ids), page, catalog_record_list.get('pages', 0),
+    )
 
     return render_template(
         'catalog_subset.html',
         catalog_record_list=catalog_record_list,
-        # app_name = current_app.config['SESSION_COOKIE_NAME'].split('.')[0]
-        app_name = client_id
+        subset_query=dict(record_id_or_doi_list=record_ids, size=size),
+        app_name=client_id,
     )
 
+
 @bp.route('/proxy-download')
 def proxy_download():
-    url = request.args.get('url')
-    print(url)
-    r = requests.get(url)
-    return Response(r.content, headers={
-        'Content-Type': r.headers.get('Content-Type', 'application/octet-stream'),
-        'Access-Control-Allow-Origin': '*'
-    })
-
-def build_metadata_pdf(data):
-    """Return a BytesIO buffer containing a one‑page PDF that mimics the
-    metadata table shown in the screenshots.
-    """
-    # ------------------------------------------------------------------
-    # 1. -------- Extract pieces we need --------------------------------
-    # ------------------------------------------------------------------
-    record = data[0]
-    meta   = record["metadata_records"][0]["metadata"]
-
-    def _get_person(person):
-        """Return (name, affiliation, email, orcid) for a creator / contributor"""
-        name        = person.get("name", "N/A")
-        affiliation = "N/A"
-        email       = "N/A"
-        orcid       = "N/A"
-
-        for aff in person.get("affiliation", []):
-            # Example format:  "Oceans and Coastal Research … , email: foo@bar"
-            if "email:" in aff["affiliation"]:
-                affiliation, email = map(str.strip, aff["affiliation"].split(", email:"))
-            else:
-                affiliation = aff["affiliation"]
-
-        for idf in person.get("nameIdentifiers", []):
-            if idf.get("nameIdentifierScheme") == "ORCID":
-                orcid = idf["nameIdentifier"]
-
-        return name, affiliation, email, orcid
-
-    # High‑level fields
-    title        = meta["titles"][0]["title"]
-    doi          = meta["doi"]
-    publisher    = meta["publisher"]
-    pub_year     = meta["publicationYear"]
-    keywords     = ", ".join(record["keywords"])
-
-    abstract     = meta["descriptions"][0]["description"]
-    t_start      = datetime.fromisoformat(record["temporal_start"]).strftime("%d %b %Y")
-    t_end        = datetime.fromisoformat(record["temporal_end"]).strftime("%d %b %Y")
-
-    geo_box      = meta["geoLocations"][0]["geoLocationBox"]
-    geo_str      = (
-        f"North: {geo_box['northBoundLatitude']}\n"
-        f"South: {geo_box['southBoundLatitude']}\n"
-        f"West: {geo_box['westBoundLongitude']}\n"
-        f"East: {geo_box['eastBoundLongitude']}"
-    )
-
-    creator      = meta["creators"][0]
-    contributor  = meta["contributors"][0]
-    cr_name, cr_aff, cr_email, cr_orcid = _get_person(creator)
-    c_name,  c_aff,  c_email,  c_orcid  = _get_person(contributor)
+    """Stream a file from an allowed upstream host through to the client.
 
-    licence      = meta["rightsList"][0]
-    licence_txt  = (
-        f'<link href="{licence["rightsURI"]}">{licence["rights"]}</link>'
-    )
+    Configured with:
 
-    # ------------------------------------------------------------------
-    # 2. -------- Paragraph & table styles ------------------------------
-    # ------------------------------------------------------------------
-    styles           = getSampleStyleSheet()
-    label_style      = ParagraphStyle(
-        "label",
-        parent=styles["BodyText"],
-        fontSize=10,
-        leading=13,
-        spaceAfter=0,
-        spaceBefore=2,
-        leftIndent=0,
-        rightIndent=6,
-        textColor=colors.black,
-        wordWrap="LTR",
-        bold=True,
-    )
-    value_style      = ParagraphStyle(
-        "value",
-        parent=styles["BodyText"],
-        fontSize=10,
-        leading=13,
-        spaceAfter=0,
-        spaceBefore=2,
-    )
-    title_value_style = ParagraphStyle(
-        "title_value",
-        parent=value_style,
-        fontSize=11,
-        leading=14,
-        spaceBefore=0,
-        spaceAfter=2,
-        bold=True,
-    )
-
-    # ------------------------------------------------------------------
-    # 3. -------- Build the table rows ----------------------------------
-    # ------------------------------------------------------------------
-    rows = [
-        [Paragraph("Title",   label_style),
-         Paragraph(title,     title_value_style)],
-
-
-        [Paragraph("DOI", label_style),
-         Paragraph(f'<link href="https://doi.org/{doi}">https://doi.org/{doi}</link>', value_style)],
-
-        [Paragraph("Authors", label_style),
-         Paragraph(f"{cr_name}<br/>{cr_aff}, email: {cr_email}", value_style)],
-
-        [Paragraph("Publisher", label_style),
-         Paragraph(f"{publisher} ({pub_year})", value_style)],
-
-        [Paragraph("Contributors", label_style),
-         Paragraph(
-             f"Contact Person: {c_name}<br/>{c_aff},<br/>email: {c_email}",
-             value_style,
-         )],
-
-        [Paragraph("Abstract", label_style),
-         Paragraph(abstract, value_style)],
-
-        [Paragraph("Data", label_style),
-         Paragraph(licence_txt, value_style)],
-
-        [Paragraph("Temporal extent", label_style),
-         Paragraph(f"{t_start} – {t_end}", value_style)],
-
-        [Paragraph("Geographic extent", label_style),
-         Paragraph(geo_str.replace("\n", "<br/>"), value_style)],
-
-        [Paragraph("Keywords", label_style),
-         Paragraph(keywords, value_style)],
-    ]
+    - CATALOG_PROXY_HOSTS: host names that files may be downloaded from,
+      e.g. the archive hosts of the catalog's download URLs; required
+    - CATALOG_PROXY_CHUNK_SIZE: bytes read from upstream per chunk
+    - CATALOG_PROXY_TIMEOUT: (connect, read) timeouts, in seconds; defaults
+      to the shared transport timeouts
+    """
+    if not (allowed_hosts := current_app.config.get('CATALOG_PROXY_HOSTS')):
+        logger.error('CATALOG_PROXY_HOSTS is not configured; file downloads are disabled')
+        abort(503)
 
-    # ------------------------------------------------------------------
-    # 4. -------- Assemble the table & PDF ------------------------------
-    # ------------------------------------------------------------------
-    table = Table(
-        rows,
-        colWidths=[1.6 * inch, 5.3 * inch],  # narrow label / wide value
-        hAlign="LEFT",
-        repeatRows=0,
-    )
+    url = request.args.get('url')
+    if not url or not proxy.is_allowed_host(url, allowed_hosts):
+        abort(403)
 
-    # Grey horizontal rule beneath every row
-    tbl_style = [
-        ("VALIGN",    (0, 0), (-1, -1), "TOP"),
-        ("TOPPADDING",(0, 0), (-1, -1), 2),
-        ("BOTTOMPADDING",(0, 0), (-1, -1), 4),
-        ("LINEBELOW", (0, 0), (-1, 0), 0.25, colors.lightgrey),
-    ]
-    # add LINEBELOW for every subsequent row
-    for r in range(1, len(rows)):
-        tbl_style.append(("LINEBELOW", (0, r), (-1, r), 0.25, colors.lightgrey))
-
-    table.setStyle(TableStyle(tbl_style))
-
-    # Build the document
-    buffer = BytesIO()
-    doc    = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=40,
-        leftMargin=40,
-        topMargin=40,
-        bottomMargin=40,
-    )
+    try:
+        response = proxy.stream_response(
+            proxy_session,
+            url,
+            request.headers,
+            chunk_size=current_app.config.get('CATALOG_PROXY_CHUNK_SIZE', 65536),
+            timeout=current_app.config.get('CATALOG_PROXY_TIMEOUT', transport.adapter.timeout),
+        )
+    except requests.RequestException:
+        abort(502)
+
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
 
-    story = [table, Spacer(1, 0.2 * inch)]
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
 
 @bp.route('/format/metadata.pdf', methods=['POST'])
 def format_metadata_pdf():
+    """Render the posted catalog records to PDF, one record per page;
+    posting several records (up to PDF_MAX_RECORDS) produces a single
+    multi-page PDF."""
     metadata = request.get_json()
     if not metadata:
         return jsonify({"error": "No metadata provided"}), 400
 
+    records = metadata if isinstance(metadata, list) else [metadata]
+    if len(records) > (max_records := current_app.config.get('PDF_MAX_RECORDS', 50)):
+        return jsonify({"error": f"At most {max_records} records may be exported at once"}), 413
+
     try:
-        pdf_buffer = build_metadata_pdf(metadata)
-        pdf_buffer.seek(0)
-        return send_file(pdf_buffer, mimetype='application/pdf', as_attachment=True, download_name='metadata.pdf')
+        pdf = render_metadata_pdf(records)
+        return send_file(BytesIO(pdf), mimetype='application/pdf', as_attachment=True, download_name='metadata.pdf')
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1,7 +1,23 @@
-from io import BytesIO
+import mimetypes
 from pathlib import Path
-
-from flask import Blueprint, abort, current_app, flash, g, redirect, render_template, request, send_file, url_for
+from urllib.parse import quote
+
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    current_app,
+    flash,
+    g,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    stream_with_context,
+    url_for,
+)
+from flask_login import current_user
+from werkzeug.datastructures import CombinedMultiDict, MultiDict
 from werkzeug.utils import secure_filename
 
 from odp.const import ODPPackageTag, ODPScope, ODPVocabulary
@@ -10,6 +26,8 @@ from odp.lib.client import ODPAPIError
 from odp.ui.base import api
 from odp.ui.base.forms import (
     AbstractTagForm,
+    BaseForm,
+    ChunkedUploadForm,
     ContributorTagForm,
     DOITagForm,
     DateRangeTagForm,
@@ -20,13 +38,19 @@ from odp.ui.base.forms import (
     PackageCreateForm,
     SDGTagForm,
     TitleTagForm,
+    UploadChunkForm,
     ZipUploadForm,
 )
-from odp.ui.base.lib import tags, utils
+from odp.ui.base.lib import tags, utils, vocabulary
+from odp.ui.base.lib.keywords import resolve_keywords
+from odp.ui.base.lib.uploads import ChunkedUpload, UploadError, file_sha256
 from odp.ui.base.templates import Button, ButtonTheme, create_btn, delete_btn
 
 bp = Blueprint('package', __name__)
 
+DOWNLOAD_CHUNK_SIZE = 65536
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
 
 @bp.route('/')
 @api.view(ODPScope.PACKAGE_READ)
@@ -46,7 +70,11 @@ def index():
 @bp.route('/<id>', methods=('GET', 'POST'))
 @api.view(ODPScope.PACKAGE_READ)
 def detail(id):
-    package = api.get(f'/package/{id}')
+    # load the institution index (see below) while fetching the package
+    package, institutions = api.gather(
+        lambda: api.get(f'/package/{id}'),
+        lambda: vocabulary.get_index(ODPVocabulary.INSTITUTION, include_proposed=True),
+    )
     resources = utils.pagify(list(filter(
         lambda r: r['status'] == ResourceStatus.active, package['resources'])))
 
@@ -93,6 +121,7 @@ def detail(id):
                     active_modal_reload_on_cancel = daterange_tag is not None
                 case 'tag-contributor':
                     contrib_form = ContributorTagForm(request.form)
+                    contrib_form.affiliations.choices = institutions.choices
                     contrib_form.validate()
                 case 'add-institution':
                     institution_form = InstitutionKeywordForm(request.form)
@@ -150,7 +179,14 @@ def detail(id):
     if not zip_form:
         zip_form = ZipUploadForm()
 
-    utils.populate_keyword_choices(contrib_form.affiliations, ODPVocabulary.INSTITUTION, include_proposed=True)
+    # only selected institutions are rendered; others are found by type-ahead
+    contrib_form.affiliations.choices = institutions.choices_for(contrib_form.affiliations.data or ())
+
+    # resolve the keywords rendered on the contributors and SDGs tabs in one go
+    resolve_keywords(
+        [keyword_id for contrib_tag in contrib_tags['items'] for keyword_id in contrib_tag['data'].get('affiliations') or ()] +
+        [keyword_id for sdg_tag in sdg_tags['items'] for keyword_id in (sdg_tag.get('keyword_ids') or ())[:3]]
+    )
 
     submit_btn = Button(
         label='Submit',
@@ -674,6 +710,7 @@ def add_institution(id):
                 api_args['data']['ror'] = 'https://ror.org/' + form.ror.data
 
             api.post('/keyword/Institution/', api_args)
+            vocabulary.invalidate(ODPVocabulary.INSTITUTION)
 
         except ODPAPIError as e:
             if response := api.handle_error(e):
@@ -700,7 +737,7 @@ def upload_file(id):
                 f'/package/{id}/files/{filename}',
                 archive_id=archive_id,
                 files={'file': file.stream},
-                sha256=form.sha256.data,
+                sha256=file_sha256(file.stream),
                 title=form.title.data or None,
                 description=form.description.data or None,
             )
@@ -733,7 +770,7 @@ def upload_zip(id):
                 archive_id=archive_id,
                 unpack=True,
                 files={'file': file.stream},
-                sha256=form.zip_sha256.data,
+                sha256=file_sha256(file.stream),
             )
             flash(f'Zip file <b>{filename}</b> has been uploaded and unpacked.', category='success')
             return redirect(url_for('.detail', **redirect_args))
@@ -747,6 +784,162 @@ def upload_zip(id):
     return redirect(url_for('.detail', **redirect_args), code=307)
 
 
+@bp.route('/<id>/upload', methods=('POST',))
+@api.view(ODPScope.PACKAGE_WRITE)
+def upload_init(id):
+    """Initiate a chunked upload of a file (or a zip file, to be unpacked)
+    to the package.
+
+    The file content is then posted in chunks to `upload_chunk`, and the
+    upload is completed with `upload_commit`. An interrupted upload may be
+    resumed from the offset returned by `upload_status`, which also reports
+    the outcome of the commit.
+    """
+    form = ChunkedUploadForm(request.form)
+    if not form.validate() or not (filename := secure_filename(form.filename.data)):
+        return jsonify(errors=form.errors), 400
+
+    upload = ChunkedUpload.create(
+        package_id=id,
+        user_id=current_user.id,
+        filename=filename,
+        size=form.size.data,
+        unpack=form.unpack.data,
+        title=form.title.data or None,
+        description=form.description.data or None,
+    )
+    return _upload_status(upload)
+
+
+@bp.route('/<id>/upload/<upload_id>')
+@api.view(ODPScope.PACKAGE_WRITE)
+def upload_status(id, upload_id):
+    """Get the offset from which to continue a chunked upload, or the
+    outcome of its commit."""
+    upload = _get_upload(id, upload_id)
+
+    if upload.status == 'done':
+        # the spool file is gone; the upload state expires in its own time
+        if upload.unpack:
+            flash(f'Zip file <b>{upload.filename}</b> has been uploaded and unpacked.', category='success')
+        else:
+            flash(f'File <b>{upload.filename}</b> has been uploaded.', category='success')
+        return jsonify(status=upload.status, redirect=url_for('.detail', id=id, _anchor='files'))
+
+    return _upload_status(upload)
+
+
+@bp.route('/<id>/upload/<upload_id>/chunk', methods=('POST',))
+@api.view(ODPScope.PACKAGE_WRITE)
+def upload_chunk(id, upload_id):
+    """Append a chunk, posted as the raw request body, to a chunked upload.
+
+    The chunk offset and SHA-256 checksum are given in the query string,
+    and the CSRF token in the X-CSRFToken header.
+    """
+    upload = _get_upload(id, upload_id)
+    form = UploadChunkForm(CombinedMultiDict([
+        request.args,
+        MultiDict({'csrf_token': request.headers.get('X-CSRFToken', '')}),
+    ]))
+    if not form.validate():
+        return jsonify(errors=form.errors, offset=upload.offset), 400
+
+    try:
+        upload.append(
+            request.stream,
+            offset=form.offset.data,
+            sha256=form.sha256.data,
+            max_size=current_app.config.get('UPLOAD_CHUNK_SIZE', UPLOAD_CHUNK_SIZE),
+        )
+    except UploadError as e:
+        return jsonify(error=e.message, offset=upload.offset), e.status_code
+
+    return _upload_status(upload)
+
+
+@bp.route('/<id>/upload/<upload_id>/commit', methods=('POST',))
+@api.view(ODPScope.PACKAGE_WRITE)
+def upload_commit(id, upload_id):
+    """Start sending a completed chunked upload to the archive.
+
+    The file is checksummed and streamed to the API in the background, so
+    that the request returns at once; the client polls `upload_status`
+    for the outcome. A failed commit may be retried; committing an upload
+    that is being or has been committed has no further effect.
+    """
+    upload = _get_upload(id, upload_id)
+    form = BaseForm(request.form)
+
+    if not form.validate():
+        return jsonify(errors=form.errors), 400
+
+    if not upload.complete:
+        return jsonify(error='The upload is incomplete', offset=upload.offset), 409
+
+    archive_id = current_app.config['ARCHIVE_ID']
+    user_id = current_user.id
+    token = api.token
+
+    def send(file, sha256):
+        try:
+            api.put_file_stream(
+                f'/package/{id}/files/{upload.filename}',
+                file,
+                upload.filename,
+                upload.size,
+                token=api.fresh_token(user_id, token),
+                archive_id=archive_id,
+                unpack=upload.unpack or None,
+                sha256=sha256,
+                title=upload.title,
+                description=upload.description,
+            )
+        except ODPAPIError as e:
+            raise UploadError(e.status_code, _api_error_message(e)) from e
+
+    upload.commit(send)
+    return _upload_status(upload), 202
+
+
+def _get_upload(id: str, upload_id: str) -> ChunkedUpload:
+    upload = ChunkedUpload.load(upload_id)
+    if not upload or upload.package_id != id or upload.user_id != current_user.id:
+        abort(404)
+
+    return upload
+
+
+def _upload_status(upload: ChunkedUpload) -> Response:
+    return jsonify(
+        upload_id=upload.id,
+        status=upload.status,
+        error=upload.error,
+        offset=upload.offset,
+        size=upload.size,
+        chunk_size=current_app.config.get('UPLOAD_CHUNK_SIZE', UPLOAD_CHUNK_SIZE),
+    )
+
+
+def _api_error_message(e: ODPAPIError) -> str:
+    if e.status_code in (401, 403):
+        return 'You are no longer authorized to upload to this package'
+
+    try:
+        if isinstance(detail := e.error_detail['detail'], str):
+            return detail
+    except (TypeError, KeyError):
+        pass
+
+    return f'The archive rejected the upload ({e.status_code})'
+
+
+@bp.cli.command('sweep-uploads')
+def sweep_uploads():
+    """Remove the spool files of abandoned chunked uploads."""
+    ChunkedUpload.sweep()
+
+
 @bp.route('/<id>/delete-file/<resource_id>', methods=('POST',))
 @api.view(ODPScope.PACKAGE_WRITE)
 def delete_file(id, resource_id):
@@ -758,17 +951,65 @@ def delete_file(id, resource_id):
 @bp.route('/<id>/download-file/<resource_id>')
 # no @api.view because this is opened in its own window
 def download_file(id, resource_id):
+    """Stream a package file from the archive to the client.
+
+    The file body is forwarded chunk by chunk as it arrives from the API,
+    while the resource metadata (for the download filename) is fetched
+    concurrently. Range requests are passed through, so that interrupted
+    downloads can be resumed.
+    """
     archive_id = current_app.config['ARCHIVE_ID']
+
+    def get_resource():
+        # return rather than raise an error, so that we can release the body stream
+        try:
+            return api.get(f'/resource/{resource_id}')
+        except ODPAPIError as e:
+            return e
+
     try:
-        resource = api.get(f'/resource/{resource_id}')
-        data = api.get_bytes(
-            f'/package/{id}/files/{resource_id}',
-            archive_id=archive_id,
+        resource, upstream = api.gather(
+            get_resource,
+            lambda: api.stream_bytes(
+                f'/package/{id}/files/{resource_id}',
+                headers={
+                    header: value
+                    for header in ('Range', 'If-Range')
+                    if (value := request.headers.get(header))
+                },
+                archive_id=archive_id,
+            ),
         )
     except ODPAPIError as e:
         abort(e.status_code, e.error_detail)
 
-    return send_file(
-        BytesIO(data),
-        download_name=Path(resource['path']).name,
+    if isinstance(resource, ODPAPIError):
+        upstream.close()
+        abort(resource.status_code, resource.error_detail)
+
+    filename = Path(resource['path']).name
+
+    def generate():
+        try:
+            yield from upstream.iter_content(DOWNLOAD_CHUNK_SIZE)
+        finally:
+            upstream.close()
+
+    response = Response(
+        stream_with_context(generate()),
+        status=upstream.status_code,
+        mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+        headers={
+            header: value
+            for header in ('Accept-Ranges', 'Content-Length', 'Content-Range', 'ETag', 'Last-Modified')
+            if (value := upstream.headers.get(header))
+        },
+        direct_passthrough=True,
     )
+    try:
+        filename.encode('ascii')
+        response.headers.set('Content-Disposition', 'inline', filename=filename)
+    except UnicodeEncodeError:
+        response.headers.set('Content-Disposition', 'inline', **{'filename*': f"UTF-8''{quote(filename)}"})
+
+    return response
@@ -1,17 +1,132 @@
+import gzip
+import hashlib
 import json
 import pathlib
+from dataclasses import dataclass
+from functools import wraps
 
-from flask import Blueprint
+from flask import Blueprint, Response, abort, jsonify, request, url_for
 
 import odp.vocab
+from odp.const import ODPScope
+from odp.const.db import KeywordStatus
+from odp.ui.base.lib import caching
 
 bp = Blueprint('vocabulary', __name__)
 
 vocab_dir = pathlib.Path(odp.vocab.__file__).parent
 
 
+@dataclass(frozen=True)
+class StaticVocabulary:
+    """A static vocabulary, serialized once for serving."""
+
+    body: bytes
+    gzip_body: bytes
+    etag: str
+
+    @classmethod
+    def load(cls, path: pathlib.Path) -> 'StaticVocabulary':
+        with open(path) as f:
+            body = json.dumps(json.load(f), separators=(',', ':')).encode()
+
+        return cls(
+            body=body,
+            gzip_body=gzip.compress(body, mtime=0),
+            etag=hashlib.sha256(body).hexdigest()[:32],
+        )
+
+
+static_vocabularies = {
+    path.stem: StaticVocabulary.load(path)
+    for path in vocab_dir.glob('*.json')
+}
+
+
+@bp.app_template_global()
+def vocabulary_url(id: str) -> str:
+    """Return the versioned URL for a static vocabulary, which may be
+    cached indefinitely by the browser."""
+    if vocab := static_vocabularies.get(id.lower()):
+        return url_for('vocabulary.get_json', id=id, v=vocab.etag)
+    return url_for('vocabulary.get_json', id=id)
+
+
 @bp.route('/<id>')
 def get_json(id):
-    """Return the JSON for a static vocabulary."""
-    with open(vocab_dir / f'{id.lower()}.json') as f:
-        return json.load(f)
+    """Return the JSON for a static vocabulary.
+
+    Vocabularies are serialized (and gzipped) once, at startup. A request
+    for a versioned URL (see `vocabulary_url`) is answered as immutable;
+    otherwise the client must revalidate, and gets a 304 if its copy is
+    current.
+    """
+    if not (vocab := static_vocabularies.get(id.lower())):
+        abort(404)
+
+    if request.args.get('v') == vocab.etag:
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = 'public, no-cache'
+
+    # the gzipped representation needs a distinct strong validator
+    if use_gzip := 'gzip' in request.accept_encodings:
+        etag = f'{vocab.etag}-gzip'
+    else:
+        etag = vocab.etag
+
+    if caching.is_not_modified(etag):
+        response = caching.not_modified(etag, cache_control)
+        response.vary.add('Accept-Encoding')
+        return response
+
+    if use_gzip:
+        response = Response(vocab.gzip_body, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(vocab.body, mimetype='application/json')
+
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def api_view(scope: ODPScope):
+    """Like `api.view`, but resolving the user API client on request,
+    as this blueprint is also registered by apps that do not create one."""
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            import odp.ui.base
+            if not (api := getattr(odp.ui.base, 'api', None)):
+                abort(404)
+
+            return api.view(scope)(f)(*args, **kwargs)
+
+        return decorated_function
+
+    return decorator
+
+
+@bp.route('/<id>/autocomplete')
+@api_view(ODPScope.KEYWORD_READ)
+def autocomplete(id):
+    """Return up to `limit` (max 100) keywords of a vocabulary whose
+    key or abbreviation has words starting with those in `q`."""
+    # imported here, as the keyword lists are fetched with the user API client
+    from odp.ui.base.lib import vocabulary
+
+    index = vocabulary.get_index(id, include_proposed=request.args.get('include_proposed') == 'true')
+    limit = min(request.args.get('limit', 20, type=int), 100)
+
+    return jsonify(items=[
+        {
+            'id': keyword['id'],
+            'key': keyword['key'],
+            'abbr': (keyword.get('data') or {}).get('abbr'),
+            'proposed': keyword['status'] == KeywordStatus.proposed,
+        }
+        for keyword in index.complete(request.args.get('q', ''), limit)
+    ])
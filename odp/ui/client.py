@@ -1,9 +1,18 @@
 import json
 import logging
+import os
 import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from contextvars import copy_context
+from io import BytesIO
 from dataclasses import asdict, dataclass
 from functools import wraps
-from typing import Optional
+from types import MappingProxyType
+from typing import Any, BinaryIO, Callable, Hashable, Mapping, Optional
+from urllib.parse import urlsplit
 
 import requests
 from authlib.integrations.flask_client import OAuth
@@ -14,7 +23,9 @@ from redis import Redis
 from odp.config import config
 from odp.const import ODPScope
 from odp.lib.cache import Cache
-from odp.lib.client import ODPAPIError, ODPBaseClient, ODPClient
+from odp.lib.client import ODPAPIError, ODPBaseClient
+from odp.ui.session import RedisSession
+from odp.ui.transport import Transport
 
 logger = logging.getLogger(__name__)
 
@@ -47,8 +58,118 @@ class LocalUser:
         return self.id
 
 
-class ODPAnonClient(ODPClient):
-    """An ODP client for Flask apps, providing anonymous access to the ODP API."""
+class TTLCache:
+    """A thread-safe, size-bounded LRU cache whose entries expire
+    `ttl` seconds after being set."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value, time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class ConcurrentCallsMixin:
+    """Mixin for an ODP client, enabling independent API calls to be made
+    concurrently on a bounded thread pool."""
+
+    def _init_executor(self, max_workers: int) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f'{self.__class__.__name__}.gather',
+        )
+
+    def gather(self, *calls: Callable[[], Any]) -> list[Any]:
+        """Make independent API calls concurrently, returning their results
+        in order. For example::
+
+            package, resource = api.gather(
+                lambda: api.get(f'/package/{id}'),
+                lambda: api.get(f'/resource/{resource_id}'),
+            )
+
+        Each call runs in a copy of the caller's context, so it sees the same
+        Flask request, session, `g` and logged-in user as the caller. If any
+        call raises an exception, the first (in argument order) is re-raised
+        once all the calls have completed, so `ODPAPIError` handling in view
+        functions is unaffected.
+
+        The last call runs on the calling thread. Gathered calls should not
+        themselves call `gather`, as that could exhaust the thread pool.
+        """
+        if not calls:
+            return []
+
+        futures = [
+            self._executor.submit(copy_context().run, call)
+            for call in calls[:-1]
+        ]
+        try:
+            last_result, last_error = calls[-1](), None
+        except Exception as e:
+            last_result, last_error = None, e
+
+        wait(futures)
+        results = [future.result() for future in futures]
+        if last_error:
+            raise last_error
+
+        return results + [last_result]
+
+    def submit(self, call: Callable[[], Any]) -> Future:
+        """Make an API call in the background, in a copy of the caller's
+        context, without waiting for its result.
+
+        The call may outlive the request that submitted it, so it should
+        not depend on request state; it should handle its own errors.
+        """
+        return self._executor.submit(copy_context().run, call)
+
+
+class ODPAnonClient(ConcurrentCallsMixin, ODPBaseClient):
+    """An ODP client for Flask apps, providing anonymous access to the ODP API.
+
+    API requests are authorized with a client credentials token, and are
+    sent over the shared (pooled) HTTP transport.
+
+    If `token_store` is given, the token is shared via Redis by all the
+    processes using this client id, and renewed by one of them at a time;
+    each process reads its own copy of the token without I/O until it is
+    due for renewal.
+    """
+
+    token_renewal_margin = 120
+    """Seconds before expiry at which a token is renewed. This exceeds
+    Authlib's expiry leeway, so that Authlib does not renew it itself."""
+
+    token_renewal_lock_expiry = 30
+    """Seconds for which a token renewal is exclusive across processes."""
 
     def __init__(
             self,
@@ -57,9 +178,98 @@ class ODPAnonClient(ODPClient):
             client_id: str,
             client_secret: str,
             scope: list[str],
+            transport: Transport = None,
+            max_workers: int = 8,
+            token_store: Redis = None,
     ) -> None:
         super().__init__(api_url, hydra_url, client_id, client_secret, scope)
         self.cache = Cache(client_id)
+        self.token_store = token_store
+        self._token_key = f'{self.__class__.__name__}.{client_id}.token'
+        self._token_lock = threading.Lock()
+        self._init_executor(max_workers)
+        self._session = (transport or Transport()).oauth2_session_class()(
+            client_id=client_id,
+            client_secret=client_secret,
+            scope=' '.join(scope),
+            token_endpoint=f'{hydra_url}/oauth2/token',
+            grant_type='client_credentials',
+        )
+
+    @property
+    def token(self) -> dict:
+        if self._token_due(self._session.token):
+            with self._token_lock:
+                # another thread may have renewed it while we waited
+                if self._token_due(self._session.token):
+                    self._session.token = self._shared_token() if self.token_store is not None \
+                        else self._session.fetch_token()
+        return self._session.token
+
+    def warm_up(self) -> None:
+        """Obtain a token ahead of the first request, logging rather than
+        raising any failure (the token will then be fetched on demand)."""
+        try:
+            _ = self.token
+        except Exception:
+            logger.exception('Failed to obtain a token for %s', self.client_id)
+
+    def _token_due(self, token: dict | None) -> bool:
+        return not token or not token.get('expires_at') or \
+            float(token['expires_at']) - time.time() < self.token_renewal_margin
+
+    def _shared_token(self) -> dict:
+        """Return the token held in the token store, renewing it first if
+        it is due; only one process renews it at a time, while others wait
+        for the renewed token."""
+        lock_key = f'{self._token_key}.lock'
+        lock_token = secrets.token_hex(8)
+        deadline = time.monotonic() + self.token_renewal_lock_expiry
+
+        while True:
+            if (stored := self.token_store.get(self._token_key)) and \
+                    not self._token_due(token := json.loads(stored)):
+                return token
+
+            if self.token_store.set(lock_key, lock_token, ex=self.token_renewal_lock_expiry, nx=True):
+                try:
+                    token = dict(self._session.fetch_token())
+                    self.token_store.set(
+                        self._token_key,
+                        json.dumps(token),
+                        ex=max(int(float(token['expires_at']) - time.time()), 1),
+                    )
+                    return token
+                finally:
+                    # the lock may have expired and been taken by another process
+                    _release_lock(self.token_store, lock_key, lock_token)
+
+            if time.monotonic() > deadline:
+                # the lock holder may have died; don't wait for it any longer
+                return dict(self._session.fetch_token())
+
+            time.sleep(0.1)
+
+    def _send_request(
+            self,
+            method: str,
+            url: str,
+            data: dict | None,
+            files: dict | None,
+            params: dict,
+            headers: dict,
+    ) -> requests.Response:
+        """Send a request to the API with the client's access token,
+        which is renewed automatically when it expires."""
+        _ = self.token
+        return self._session.request(
+            method,
+            url,
+            json=data,
+            files=files,
+            params=params,
+            headers=headers,
+        )
 
     @staticmethod
     def view():
@@ -84,10 +294,17 @@ class ODPAnonClient(ODPClient):
         return decorator
 
 
-class ODPUserClient(ODPBaseClient):
+class ODPUserClient(ConcurrentCallsMixin, ODPBaseClient):
     """An ODP client for Flask apps, providing signup, login and logout,
     and API access with a logged in user's access token."""
 
+    token_expiry_leeway = 60
+    """Seconds before expiry at which Authlib considers a token expired
+    (the OAuth2Session default)."""
+
+    token_refresh_lock_expiry = 30
+    """Seconds for which a user's token refresh is exclusive across processes."""
+
     def __init__(
             self,
             api_url: str,
@@ -97,9 +314,31 @@ class ODPUserClient(ODPBaseClient):
             scope: list[str],
             cache: Redis,
             app: Flask,
+            transport: Transport = None,
+            max_workers: int = 8,
+            local_cache_ttl: float = 30,
+            token_refresh_margin: float = 300,
     ) -> None:
         super().__init__(api_url, hydra_url, client_id, client_secret, scope)
         self.cache = cache
+        self._init_executor(max_workers)
+
+        # tokens expiring within the margin are refreshed in the background;
+        # refreshes are kept apart from the gather pool, as gathered calls
+        # may wait on them
+        self.token_refresh_margin = token_refresh_margin
+        self._refresh_executor = ThreadPoolExecutor(
+            max_workers=2,
+            thread_name_prefix=f'{self.__class__.__name__}.refresh',
+        )
+        self._refreshes: dict[str, Future] = {}
+        self._refreshes_lock = threading.Lock()
+
+        # per-process cache of users and permissions, in front of Redis;
+        # entries are invalidated across processes via Redis pub/sub
+        self._local_cache = TTLCache(maxsize=4096, ttl=local_cache_ttl)
+        self._invalidation_channel = f'{self.__class__.__name__}.{self.client_id}.invalidate'
+        self._invalidation_listener_pid = None
         self.oauth = OAuth(
             app=app,
             cache=cache,
@@ -113,6 +352,8 @@ class ODPUserClient(ODPBaseClient):
             client_kwargs={'scope': ' '.join(scope)},
             server_metadata_url=f'{hydra_url}/.well-known/openid-configuration',
         )
+        # Authlib creates a session per request; have them share our connection pools
+        self.oauth.hydra.client_cls = (transport or Transport()).oauth2_session_class()
 
         app.add_url_rule('/oauth2/signup', endpoint='hydra.signup', view_func=self._signup)
         app.add_url_rule('/oauth2/login', endpoint='hydra.login', view_func=self._login)
@@ -149,11 +390,72 @@ class ODPUserClient(ODPBaseClient):
             headers=headers,
         )
 
+    def stream_bytes(self, path: str, headers: dict = None, **params) -> requests.Response:
+        """Send a GET request to the API with the user's access token,
+        without reading the response body.
+
+        The body may then be consumed chunk by chunk with `iter_content`;
+        the caller is responsible for closing the returned response.
+        """
+        r = self.oauth.hydra.request(
+            'GET',
+            self.api_url + path,
+            params=params,
+            headers=headers or {},
+            stream=True,
+        )
+        try:
+            r.raise_for_status()
+        except requests.HTTPError as e:
+            # read the error detail before releasing the connection
+            error = ODPAPIError(e.response)
+            r.close()
+            raise error from e
+
+        return r
+
+    def put_file_stream(
+            self,
+            path: str,
+            file: BinaryIO,
+            filename: str,
+            size: int,
+            token: dict = None,
+            **params,
+    ) -> dict:
+        """Upload `file` to the API as the 'file' part of a multipart
+        request, with the user's access token.
+
+        Unlike `put_files`, the request body is streamed from `file` as it
+        is sent, rather than being assembled in memory first. `file` must
+        be seekable, so that the body can be rewound if the request is
+        retried.
+
+        Outside of a request (e.g. in a background task), the user's
+        `token` must be given; see `fresh_token`.
+        """
+        body = MultipartFileStream(file, filename, size)
+        r = self.oauth.hydra.request(
+            'PUT',
+            self.api_url + path,
+            token=token,
+            data=body,
+            params=params,
+            headers={'Content-Type': body.content_type},
+        )
+        try:
+            r.raise_for_status()
+        except requests.HTTPError as e:
+            raise ODPAPIError(e.response) from e
+
+        return r.json()
+
     def _signup(self):
         """Initiate signup.
 
         Return a redirect to the Hydra authorization endpoint.
         """
+        self._save_return_url()
         redirect_uri = url_for('hydra.logged_in', _external=True)
         return self.oauth.hydra.authorize_redirect(redirect_uri, mode='signup')
 
@@ -162,6 +464,7 @@ class ODPUserClient(ODPBaseClient):
 
         Return a redirect to the Hydra authorization endpoint.
         """
+        self._save_return_url()
         redirect_uri = url_for('hydra.logged_in', _external=True)
         return self.oauth.hydra.authorize_redirect(redirect_uri, mode='login')
 
@@ -184,14 +487,11 @@ class ODPUserClient(ODPBaseClient):
             active=True,  # we'll only get to this point if the user is active
         )
 
-        self.cache.hset(self._cache_key(user_id, 'token'), mapping=token)
-        self.cache.set(self._cache_key(user_id, 'user'), json.dumps(asdict(localuser)))
-
+        user_permissions = None
         try:
             # force use of the ODP API token endpoint, in case we are cliented to another API
             token_data = self.get('/token/', api_url=config.ODP.API_URL)
             user_permissions = token_data['permissions']
-            self.cache.set(self._cache_key(user_id, 'permissions'), json.dumps(user_permissions))
 
         except ODPAPIError as e:
             if e.status_code == 403:
@@ -203,12 +503,44 @@ class ODPUserClient(ODPBaseClient):
                 self.handle_error(e)
                 return redirect(url_for('home.index'))
 
+        # write the session state in a single transaction
+        with self.cache.pipeline() as pipe:
+            pipe.hset(self._cache_key(user_id, 'token'), mapping=token)
+            pipe.set(self._cache_key(user_id, 'user'), json.dumps(asdict(localuser)))
+            if user_permissions is not None:
+                pipe.set(self._cache_key(user_id, 'permissions'), json.dumps(user_permissions))
+            self._invalidate_local(user_id, pipe)
+            pipe.execute()
+
+        if isinstance(session, RedisSession):
+            # don't carry a pre-login session id over into the logged in session
+            session.regenerate()
+
         login_user(localuser)
 
-        active_page = session.get('active_page_url') or url_for('home.index')
+        active_page = session.pop('active_page_url', None) or url_for('home.index')
 
         return redirect(active_page)
 
+    @staticmethod
+    def _save_return_url():
+        """Record the page to return to after login, given by the `next`
+        arg or else by the referrer, provided it is an absolute URL within
+        this app (including any prefix under which the app is mounted).
+
+        This is done only here, where the session is being written anyway,
+        so that other pages do not modify the session (and so do not get
+        a Set-Cookie header).
+        """
+        if url := request.args.get('next') or request.referrer:
+            target = urlsplit(url)
+            if target.scheme in ('http', 'https') and target.netloc == request.host and \
+                    (target.path + '/').startswith(request.script_root + '/'):
+                session['active_page_url'] = url
+                return
+
+        session.pop('active_page_url', None)
+
     def _logout(self):
         """Initiate logout.
 
@@ -238,37 +570,226 @@ class ODPUserClient(ODPBaseClient):
             if state_val == self.cache.get(key := self._cache_key(user_id, 'state')):
                 logout_user()
                 self.cache.delete(key)
+                self._invalidate_local(user_id)
 
         return redirect(url_for('home.index'))
 
     def _get_user(self, user_id):
         """Return the cached user object."""
-        if serialized_user := self.cache.get(self._cache_key(user_id, 'user')):
-            return LocalUser(**json.loads(serialized_user))
+        return self._session_state(user_id)['user']
+
+    def _get_permissions(self, user_id) -> Mapping | frozenset:
+        """Return the cached user permissions, as an immutable
+        mapping (or set) supporting constant-time scope lookup."""
+        return self._session_state(user_id)['permissions']
 
-    def _get_permissions(self, user_id):
-        """Return the cached user permissions."""
-        if serialized_permissions := self.cache.get(self._cache_key(user_id, 'permissions')):
-            return json.loads(serialized_permissions)
-        return {}
+    def _session_state(self, user_id) -> dict:
+        """Return the cached user object, permissions and token for the
+        current request.
+
+        These are loaded on first use in each request. The token, along
+        with the user and permissions if they are not held in the local
+        cache, is read from Redis in a single pipelined round trip.
+        """
+        if (state := g.get('odp_session_state')) and state['user_id'] == user_id:
+            return state
+
+        self._listen_for_invalidation()
+        user = self._local_cache.get((user_id, 'user'))
+        permissions = self._local_cache.get((user_id, 'permissions'))
+
+        with self.cache.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self._cache_key(user_id, 'token'))
+            if user is None:
+                pipe.get(self._cache_key(user_id, 'user'))
+            if permissions is None:
+                pipe.get(self._cache_key(user_id, 'permissions'))
+            token, *results = pipe.execute()
+
+        if user is None and (serialized_user := results.pop(0)):
+            user = LocalUser(**json.loads(serialized_user))
+            self._local_cache.set((user_id, 'user'), user)
+
+        if permissions is None:
+            serialized_permissions = results.pop(0)
+            permissions = _freeze_permissions(json.loads(serialized_permissions) if serialized_permissions else {})
+            self._local_cache.set((user_id, 'permissions'), permissions)
+
+        g.odp_session_state = state = dict(
+            user_id=user_id,
+            user=user,
+            permissions=permissions,
+            token=token,
+        )
+        return state
+
+    def _invalidate_local(self, user_id, redis: Redis = None):
+        """Discard a user's entries from the local caches of all processes.
+
+        `redis` may be a pipeline, in which case the invalidation message
+        is sent when the pipeline is executed.
+        """
+        self._local_cache.discard((user_id, 'user'))
+        self._local_cache.discard((user_id, 'permissions'))
+        g.pop('odp_session_state', None)
+        (redis or self.cache).publish(self._invalidation_channel, user_id)
+
+    def _listen_for_invalidation(self):
+        """Start a background thread in this process (if not already
+        started) to receive invalidation messages from other processes."""
+        if self._invalidation_listener_pid == (pid := os.getpid()):
+            return
+
+        self._invalidation_listener_pid = pid
+        self._local_cache.clear()
+
+        def on_invalidate(message):
+            self._local_cache.discard((message['data'], 'user'))
+            self._local_cache.discard((message['data'], 'permissions'))
+
+        def on_error(e, pubsub, thread):
+            # we may have missed messages; fall back to Redis until we
+            # are listening again
+            logger.exception('User cache invalidation listener failed')
+            self._invalidation_listener_pid = None
+            self._local_cache.clear()
+            thread.stop()
+            pubsub.close()
+
+        pubsub = self.cache.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self._invalidation_channel: on_invalidate})
+        pubsub.run_in_thread(sleep_time=1, daemon=True, exception_handler=on_error)
 
     def _cache_key(self, user_id, key):
         return f'{self.__class__.__name__}.{self.client_id}.{user_id}.{key}'
 
     def _fetch_token(self, hydra):
+        """Return the logged in user's token.
+
+        A token that is due to expire within `token_refresh_margin` seconds
+        is refreshed in the background, so that the user's requests do not
+        wait on the refresh. A token that is about to expire (such that
+        Authlib would refresh it in this request) is refreshed before it is
+        returned; concurrent requests for the same user share the refresh.
+        """
         # logger.debug('_fetch_token')
         if user_id := current_user.get_id():
-            token = self.cache.hgetall(self._cache_key(user_id, 'token'))
+            token = self._session_state(user_id)['token']
             # logger.debug('token.access_token = %s', token['access_token'])
             # logger.debug('token.refresh_token = %s', token['refresh_token'])
+            if token.get('refresh_token') and (expires_at := token.get('expires_at')):
+                expires_in = float(expires_at) - time.time()
+                if expires_in < self.token_expiry_leeway + 1:
+                    try:
+                        token = self._refresh_token(user_id, token).result(timeout=self.token_refresh_lock_expiry)
+                    except FutureTimeoutError:
+                        logger.warning('Timed out waiting for token refresh for user %s', user_id)
+                    g.odp_session_state['token'] = token
+                elif expires_in < self.token_refresh_margin:
+                    self._refresh_token(user_id, token)
+
+            return token
+
+    def fresh_token(self, user_id, token: dict) -> dict:
+        """Return a user's `token`, refreshed first if it is about to expire.
+
+        This is for use outside of a request, e.g. by a background task
+        acting for the user with a token obtained earlier from `token`.
+        """
+        if token.get('refresh_token') and (expires_at := token.get('expires_at')):
+            if float(expires_at) - time.time() < self.token_expiry_leeway + 1:
+                try:
+                    token = self._refresh_token(user_id, token).result(timeout=self.token_refresh_lock_expiry)
+                except FutureTimeoutError:
+                    logger.warning('Timed out waiting for token refresh for user %s', user_id)
+
+        return token
+
+    def _refresh_token(self, user_id, token: dict) -> Future:
+        """Start a background refresh of a user's token, unless one is
+        already in flight in this process.
+
+        The returned future's result is the refreshed token, or else the
+        token passed in.
+        """
+        with self._refreshes_lock:
+            if (future := self._refreshes.get(user_id)) is None:
+                future = self._refreshes[user_id] = self._refresh_executor.submit(
+                    self._refresh_token_exclusive, user_id, token,
+                )
+                future.add_done_callback(lambda _: self._refreshes.pop(user_id, None))
+
+        return future
+
+    def _refresh_token_exclusive(self, user_id, token: dict) -> dict:
+        """Refresh a user's token while holding the user's refresh lock
+        in Redis, or, if another process holds the lock, wait for that
+        process to store the refreshed token."""
+        token_key = self._cache_key(user_id, 'token')
+        lock_key = self._cache_key(user_id, 'token_refresh')
+        lock_token = secrets.token_hex(8)
+
+        if not self.cache.set(lock_key, lock_token, ex=self.token_refresh_lock_expiry, nx=True):
+            return self._await_token_refresh(user_id, token)
+
+        try:
+            # the token may have been refreshed since it was read
+            if (stored := self.cache.hgetall(token_key)).get('access_token') != token.get('access_token'):
+                return stored
+
+            metadata = self.oauth.hydra.load_server_metadata()
+            with self.oauth.hydra.client_cls(
+                    client_id=self.client_id,
+                    client_secret=self.client_secret,
+                    token=token,
+                    **self.oauth.hydra.client_kwargs,
+            ) as oauth_session:
+                new_token = dict(oauth_session.refresh_token(
+                    metadata['token_endpoint'],
+                    refresh_token=token['refresh_token'],
+                ))
+
+            self.cache.hset(token_key, mapping=new_token)
+            return new_token
+
+        except Exception:
+            logger.exception('Token refresh failed for user %s', user_id)
             return token
 
+        finally:
+            # the lock may have expired and been taken by another process
+            _release_lock(self.cache, lock_key, lock_token)
+
+    def _await_token_refresh(self, user_id, token: dict) -> dict:
+        """Wait for another process to refresh a user's token; return the
+        refreshed token, or the one passed in if the refresh fails."""
+        token_key = self._cache_key(user_id, 'token')
+        lock_key = self._cache_key(user_id, 'token_refresh')
+        deadline = time.monotonic() + self.token_refresh_lock_expiry
+
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            with self.cache.pipeline(transaction=False) as pipe:
+                pipe.hgetall(token_key)
+                pipe.exists(lock_key)
+                stored, locked = pipe.execute()
+
+            if stored.get('access_token') != token.get('access_token'):
+                return stored
+            if not locked:
+                break
+
+        return token
+
     def _update_token(self, hydra, token, refresh_token=None, access_token=None):
         # logger.debug(f'_update_token({refresh_token=}, {access_token=})')
         if user_id := current_user.get_id():
             # logger.debug('token.access_token = %s', token['access_token'])
             # logger.debug('token.refresh_token = %s', token['refresh_token'])
-            self.cache.hset(self._cache_key(user_id, 'token'), mapping=token)
+            with self.cache.pipeline() as pipe:
+                pipe.hset(self._cache_key(user_id, 'token'), mapping=token)
+                self._invalidate_local(user_id, pipe)
+                pipe.execute()
             self.oauth.hydra.token = token
 
     def view(self, scope: ODPScope):
@@ -327,6 +848,77 @@ class ODPUserClient(ODPBaseClient):
         return _handle_error(e)
 
 
+class MultipartFileStream:
+    """A file-like multipart/form-data request body consisting of a single
+    file part, which reads through to the underlying file on demand.
+
+    Having a length, it is sent by `requests` with a Content-Length header
+    (rather than chunked), in blocks read from the file as the upload proceeds.
+    Being seekable, it is rewound by urllib3 if the request is retried.
+    """
+
+    def __init__(self, file: BinaryIO, filename: str, size: int) -> None:
+        boundary = secrets.token_hex(16)
+        filename = filename.replace('"', '%22')
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+        head = (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode()
+        )
+        tail = f'\r\n--{boundary}--\r\n'.encode()
+        # (stream, start position in stream, length) of each part
+        self._parts = [
+            (BytesIO(head), 0, len(head)),
+            (file, file.tell(), size),
+            (BytesIO(tail), 0, len(tail)),
+        ]
+        self._len = len(head) + size + len(tail)
+        self._pos = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self._len
+        self._pos = min(max(offset, 0), self._len)
+        return self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        end = self._len if size < 0 else min(self._pos + size, self._len)
+        data = b''
+        base = 0
+        for stream, start, length in self._parts:
+            while base <= self._pos < min(base + length, end):
+                stream.seek(start + self._pos - base)
+                if not (chunk := stream.read(min(base + length, end) - self._pos)):
+                    raise ValueError('File is shorter than its given size')
+                data += chunk
+                self._pos += len(chunk)
+            base += length
+        return data
+
+
+def _release_lock(redis: Redis, key: str, token: str) -> None:
+    """Delete a lock only if it is still held with `token`."""
+    # imported here, as odp.ui.base imports this module
+    from odp.ui.base.lib.cache import RedisCache
+
+    RedisCache(redis).release(key, value=token)
+
+
+def _freeze_permissions(permissions: dict | list) -> Mapping | frozenset:
+    if isinstance(permissions, dict):
+        return MappingProxyType(permissions)
+    return frozenset(permissions)
+
+
 def _handle_error(e: ODPAPIError) -> Response | None:
     """For authentication and authorization errors we bail out and return
     an appropriate redirect. For any other kind of error, we just display
@@ -0,0 +1,133 @@
+import secrets
+from typing import Any, Callable, Iterator
+
+from flask import Flask, Request, Response
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from redis import Redis
+
+
+class RedisSession(SessionMixin):
+    """A session whose data is held in Redis, and loaded only when the
+    session is first accessed."""
+
+    def __init__(self, sid: str, load: Callable[[], str | None] = None) -> None:
+        self.sid = sid
+        self.previous_sid = None  # set if the session id has been regenerated
+        self.new = load is None
+        self.modified = False
+        self.accessed = False
+        self.stored = None  # serialized data, as loaded from Redis
+        self._load = load
+        self._data = None if load else {}
+
+    @property
+    def data(self) -> dict:
+        self.accessed = True
+        if self._data is None:
+            self.stored = self._load()
+            self._data = RedisSessionInterface.serializer.loads(self.stored) if self.stored else {}
+        return self._data
+
+    def __getitem__(self, key: str) -> Any:
+        return self.data[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key: str) -> None:
+        del self.data[key]
+        self.modified = True
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def regenerate(self) -> None:
+        """Move the session data to a new session id, discarding the old
+        one when the session is saved. This should be done whenever the
+        user's privileges change (i.e. on login), so that a session id
+        planted in the client before login is of no use afterwards."""
+        self.data  # load the data, if not yet loaded
+        self.previous_sid = self.previous_sid or self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.stored = None
+
+
+class RedisSessionInterface(SessionInterface):
+    """Session interface storing sessions in Redis, with only an opaque,
+    random session id in the cookie.
+
+    Sessions are loaded on first access, so requests that do not use the
+    session (e.g. for static files) cost no Redis round trip. A session
+    is written back only if its serialized data has changed, and the
+    cookie is only set when a session is created, so that most
+    responses carry no Set-Cookie header.
+
+    If SESSION_REFRESH_EACH_REQUEST is set, a permanent session's expiry
+    and cookie are renewed on every request that accesses the session,
+    as with Flask's cookie sessions.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, redis: Redis, prefix: str = 'session') -> None:
+        self.redis = redis
+        self.prefix = prefix
+
+    def open_session(self, app: Flask, request: Request) -> RedisSession:
+        if sid := request.cookies.get(self.get_cookie_name(app)):
+            return RedisSession(sid, lambda: self.redis.get(self._key(sid)))
+
+        return RedisSession(secrets.token_urlsafe(32))
+
+    def save_session(self, app: Flask, session: RedisSession, response: Response) -> None:
+        if not session.accessed:
+            return
+
+        response.vary.add('Cookie')
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.previous_sid:
+            self.redis.delete(self._key(session.previous_sid))
+
+        if not session:
+            if (not session.new and session.stored) or session.previous_sid:
+                self.redis.delete(self._key(session.sid))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if not session.new and session.stored is None:
+            # the session has expired from Redis; don't adopt the
+            # client's session id for new data
+            session.sid = secrets.token_urlsafe(32)
+            session.new = True
+
+        refresh = session.permanent and app.config['SESSION_REFRESH_EACH_REQUEST']
+        expiry = int(app.permanent_session_lifetime.total_seconds())
+        data = self.serializer.dumps(dict(session))
+        if data != session.stored:
+            self.redis.set(self._key(session.sid), data, ex=expiry)
+        elif refresh:
+            self.redis.expire(self._key(session.sid), expiry)
+
+        if session.new or refresh:
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+    def _key(self, sid: str) -> str:
+        return f'{self.prefix}.{sid}'
@@ -0,0 +1,141 @@
+import logging
+import time
+from dataclasses import dataclass
+
+import requests
+from authlib.integrations.requests_client import OAuth2Session
+from flask import Flask
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TransportConfig:
+    """Connection pool, retry and timeout settings for outgoing HTTP requests."""
+
+    pool_connections: int = 10
+    """Number of per-host connection pools to keep."""
+
+    pool_maxsize: int = 10
+    """Maximum number of keep-alive connections per host."""
+
+    pool_block: bool = False
+    """Whether to wait for a free connection when a host's pool is exhausted,
+    rather than opening an extra connection that is discarded after use."""
+
+    max_retries: int = 2
+    """Number of retries of idempotent requests on connection and read errors."""
+
+    backoff_factor: float = 0.2
+    connect_timeout: float = 5
+    read_timeout: float = 60
+
+    stats_interval: float = 300
+    """Minimum number of seconds between logging the pool stats, which
+    are logged at DEBUG level after a request."""
+
+    @classmethod
+    def from_app(cls, app: Flask) -> 'TransportConfig':
+        """Load settings from HTTP_* app config values, e.g. HTTP_POOL_MAXSIZE."""
+        return cls(**{
+            field: app.config[key]
+            for field in cls.__dataclass_fields__
+            if (key := f'HTTP_{field.upper()}') in app.config
+        })
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """An HTTP adapter that may be shared by many sessions, applying
+    default timeouts to requests that do not specify their own."""
+
+    def __init__(self, config: TransportConfig) -> None:
+        self.timeout = (config.connect_timeout, config.read_timeout)
+        super().__init__(
+            pool_connections=config.pool_connections,
+            pool_maxsize=config.pool_maxsize,
+            pool_block=config.pool_block,
+            max_retries=Retry(
+                total=config.max_retries,
+                connect=config.max_retries,
+                read=config.max_retries,
+                status=0,
+                # only idempotent verbs are retried (the urllib3 default), so
+                # that a request is never replayed on a reused connection
+                # unless that is safe
+                allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+                backoff_factor=config.backoff_factor,
+                raise_on_status=False,
+            ),
+        )
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=timeout or self.timeout, **kwargs)
+
+
+class Transport:
+    """A shared HTTP transport for the ODP UI clients, keeping connections
+    to the API, Hydra and any other upstream hosts alive between requests."""
+
+    def __init__(self, config: TransportConfig = TransportConfig()) -> None:
+        self.config = config
+        self.adapter = PooledHTTPAdapter(config)
+        self._stats_logged_at = time.monotonic()
+
+    def mount(self, session: requests.Session) -> None:
+        session.mount('http://', self.adapter)
+        session.mount('https://', self.adapter)
+
+    def session(self) -> requests.Session:
+        """Return a new session that sends requests over the shared pools."""
+        session = requests.Session()
+        self.mount(session)
+        return session
+
+    def oauth2_session_class(self) -> type[OAuth2Session]:
+        """Return an Authlib OAuth2Session class whose instances send
+        requests over the shared pools."""
+        transport = self
+
+        class PooledOAuth2Session(OAuth2Session):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                transport.mount(self)
+
+            def close(self):
+                # the shared adapter outlives the session
+                pass
+
+        return PooledOAuth2Session
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Return request and connection counts for each live host pool.
+
+        `reused` is the number of requests that were sent on an already
+        open (keep-alive) connection, i.e. the number of pool hits.
+        """
+        pools = self.adapter.poolmanager.pools
+        stats = {}
+        for key in pools.keys():
+            if pool := pools.get(key):
+                stats[f'{pool.scheme}://{pool.host}:{pool.port}'] = {
+                    'requests': pool.num_requests,
+                    'connections': pool.num_connections,
+                    'reused': max(pool.num_requests - pool.num_connections, 0),
+                }
+
+        return stats
+
+    def log_stats(self) -> None:
+        """Log the pool stats at DEBUG level, unless they have been logged
+        within the last `stats_interval` seconds."""
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+
+        now = time.monotonic()
+        if now - self._stats_logged_at < self.config.stats_interval:
+            return
+
+        self._stats_logged_at = now
+        logger.debug('HTTP transport stats: %s', self.stats())
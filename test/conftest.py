@@ -0,0 +1,53 @@
+import fakeredis
+import pytest
+from flask import Flask
+
+import odp.ui.base
+
+
+class FakeClient:
+    """Stands in for the app's cli client, recording the API paths requested
+    and answering them with `handler`."""
+
+    client_id = 'odp.test'
+
+    def __init__(self) -> None:
+        self.calls = []
+        self.handler = None
+
+    def get(self, path: str, **params):
+        self.calls.append(path)
+        return self.handler(path, **params)
+
+    def gather(self, *calls):
+        return [call() for call in calls]
+
+    def submit(self, call):
+        call()
+
+
+# stand-ins for the app globals created by odp.ui.base.init_app, which
+# library modules bind on import
+odp.ui.base.redis_cache = fakeredis.FakeRedis(decode_responses=True)
+odp.ui.base.cli = FakeClient()
+
+
+@pytest.fixture(autouse=True)
+def redis_cache():
+    yield odp.ui.base.redis_cache
+    odp.ui.base.redis_cache.flushall()
+
+
+@pytest.fixture
+def cli():
+    odp.ui.base.cli.calls.clear()
+    odp.ui.base.cli.handler = None
+    return odp.ui.base.cli
+
+
+@pytest.fixture
+def app_context(tmp_path):
+    app = Flask(__name__)
+    app.config['UPLOAD_CHUNK_DIR'] = str(tmp_path)
+    with app.app_context():
+        yield app
@@ -0,0 +1,76 @@
+import pytest
+
+from odp.ui.base.lib import catalog_search
+from odp.ui.base.lib.catalog_search import normalize_query
+
+CATALOG_ID = 'SAEON'
+
+
+@pytest.fixture
+def catalog(cli, app_context):
+    catalog = {'timestamp': 't1'}
+
+    def handler(path, **params):
+        if path == f'/catalog/{CATALOG_ID}':
+            return catalog
+        return {'items': [], 'query': params}
+
+    cli.handler = handler
+    return catalog
+
+
+def search_calls(cli):
+    return [path for path in cli.calls if path.endswith('/search')]
+
+
+def test_empty_params_are_dropped():
+    assert normalize_query(text_query=' ', facet_query='{}', start_date=None, page='1') == {'page': 1}
+
+
+def test_strings_are_stripped():
+    assert normalize_query(text_query=' rain ') == {'text_query': 'rain'}
+
+
+def test_facets_are_sorted():
+    assert normalize_query(facet_query='{"b": "2", "a": "1"}') == \
+           normalize_query(facet_query={'a': '1', 'b': '2'}) == \
+           {'facet_query': '{"a": "1", "b": "2"}'}
+
+
+def test_bounds_are_rounded():
+    assert normalize_query(north_bound='-33.924868', west_bound=18.4241) == \
+           {'north_bound': -33.9249, 'west_bound': 18.4241}
+
+
+@pytest.mark.parametrize('params, query', [
+    (dict(page='2', size='25'), dict(page=2, size=25)),
+    (dict(page=2, size=25), dict(page=2, size=25)),
+    (dict(page='x'), dict(page='x')),
+    (dict(north_bound='x'), dict(north_bound='x')),
+])
+def test_numbers_are_parsed(params, query):
+    assert normalize_query(**params) == query
+
+
+def test_equivalent_searches_share_a_result(cli, catalog):
+    first = catalog_search.search(CATALOG_ID, text_query='rain', north_bound='-33.92491', facet_query='{"b": "2", "a": "1"}')
+    second = catalog_search.search(CATALOG_ID, text_query=' rain', north_bound=-33.9249, facet_query='{"a": "1", "b": "2"}', end_date='')
+    assert second == first
+    assert len(search_calls(cli)) == 1
+
+
+def test_searches_are_refetched_when_catalog_publishes(cli, catalog):
+    catalog_search.search(CATALOG_ID, text_query='rain')
+    catalog['timestamp'] = 't2'
+    catalog_search.search_cache.delete(CATALOG_ID, 'stamp')
+    catalog_search.search(CATALOG_ID, text_query='rain')
+    assert len(search_calls(cli)) == 2
+
+
+def test_stale_result_is_served_while_refreshed(cli, catalog, app_context):
+    app_context.config['CATALOG_SEARCH_TTL'] = -1
+    first = catalog_search.search(CATALOG_ID, text_query='rain')
+    assert catalog_search.search(CATALOG_ID, text_query='rain') == first
+    # the fake client runs the refresh before returning
+    assert len(search_calls(cli)) == 2
+    assert not catalog_search.search_cache.get(*catalog_search._cache_key(CATALOG_ID, {'text_query': 'rain'}), 'refresh')
@@ -0,0 +1,57 @@
+import pytest
+from flask import Flask, request, session
+
+from odp.ui.base.forms import BaseForm, SharedSessionCSRF
+
+
+class SharedCSRFForm(BaseForm):
+    class Meta:
+        csrf_class = SharedSessionCSRF
+        csrf_secret = b'test-csrf-secret'
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.secret_key = 'test-secret-key'
+
+    @app.route('/form', methods=('GET', 'POST'))
+    def form():
+        form = SharedCSRFForm(request.form)
+        if request.method == 'POST':
+            return 'valid' if form.validate() else 'invalid'
+        return form.csrf_token._value()
+
+    @app.route('/expire')
+    def expire():
+        session.clear()
+        return ''
+
+    return app.test_client()
+
+
+def test_post_with_empty_session(client):
+    response = client.post('/form', data={'csrf_token': '20991231000000##0123456789abcdef'})
+    assert response.status_code == 200
+    assert response.text == 'invalid'
+
+
+def test_post_without_token(client):
+    response = client.post('/form')
+    assert response.status_code == 200
+    assert response.text == 'invalid'
+
+
+def test_post_after_session_expired(client):
+    token = client.get('/form').text
+    client.get('/expire')
+    response = client.post('/form', data={'csrf_token': token})
+    assert response.status_code == 200
+    assert response.text == 'invalid'
+
+
+def test_post_with_rendered_token(client):
+    token = client.get('/form').text
+    response = client.post('/form', data={'csrf_token': token})
+    assert response.status_code == 200
+    assert response.text == 'valid'
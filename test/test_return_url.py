@@ -0,0 +1,54 @@
+import pytest
+from flask import Flask, request, session
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from odp.ui.client import ODPUserClient
+
+PREFIX = {'X-Forwarded-Prefix': '/mims'}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.secret_key = 'test-secret-key'
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_prefix=1)
+
+    @app.route('/catalog/<id>')
+    def page(id):
+        # as passed by the "Log in" link
+        return request.url
+
+    @app.route('/oauth2/login')
+    def login():
+        ODPUserClient._save_return_url()
+        return session.get('active_page_url', '')
+
+    return app.test_client()
+
+
+def test_login_link_includes_prefix(client):
+    assert client.get('/catalog/abc', headers=PREFIX).text == 'http://localhost/mims/catalog/abc'
+
+
+def test_return_url_in_prefixed_deployment(client):
+    url = client.get('/catalog/abc', headers=PREFIX).text
+    response = client.get('/oauth2/login', query_string={'next': url}, headers=PREFIX)
+    assert response.text == 'http://localhost/mims/catalog/abc'
+
+
+def test_return_url_from_referrer(client):
+    response = client.get('/oauth2/login', headers=PREFIX | {'Referer': 'http://localhost/mims/catalog/abc?q=1'})
+    assert response.text == 'http://localhost/mims/catalog/abc?q=1'
+
+
+@pytest.mark.parametrize('url', [
+    'http://evil.example/mims/catalog/abc',
+    'http://localhost/other/catalog/abc',
+    'http://localhost/mimsx/catalog/abc',
+    '/mims/catalog/abc',
+    '//evil.example/mims/catalog/abc',
+    'javascript://localhost/mims/%0aalert(1)',
+])
+def test_foreign_return_url_is_rejected(client, url):
+    response = client.get('/oauth2/login', query_string={'next': url}, headers=PREFIX)
+    assert response.text == ''
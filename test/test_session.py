@@ -0,0 +1,158 @@
+from datetime import timedelta
+
+import pytest
+from flask import Flask, session
+
+from odp.ui.session import RedisSessionInterface
+
+COOKIE = 'odp.test.session'
+
+
+class RecordingRedis:
+    """Records the names of the Redis commands issued through it."""
+
+    def __init__(self, redis) -> None:
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        self.commands.append(name)
+        return getattr(self.redis, name)
+
+
+@pytest.fixture
+def redis(redis_cache):
+    return RecordingRedis(redis_cache)
+
+
+@pytest.fixture
+def app(redis):
+    app = Flask(__name__)
+    app.config |= dict(
+        SESSION_COOKIE_NAME=COOKIE,
+        PERMANENT_SESSION_LIFETIME=timedelta(hours=1),
+    )
+    app.session_interface = RedisSessionInterface(redis, 'odp.test.session')
+
+    @app.route('/static-page')
+    def static_page():
+        return ''
+
+    @app.route('/get')
+    def get():
+        return session.get('value', '')
+
+    @app.route('/set/<value>')
+    def set_(value):
+        session['value'] = value
+        return ''
+
+    @app.route('/set-permanent/<value>')
+    def set_permanent(value):
+        session.permanent = True
+        session['value'] = value
+        return ''
+
+    @app.route('/login')
+    def login():
+        session.regenerate()
+        session['user'] = 'user'
+        return ''
+
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def sid(client):
+    return client.get_cookie(COOKIE).value
+
+
+def stored_sids(redis_cache):
+    return {key.removeprefix('odp.test.session.') for key in redis_cache.keys('odp.test.session.*')}
+
+
+def test_session_is_not_loaded_unless_accessed(client, redis):
+    client.set_cookie(COOKIE, 'some-sid')
+    response = client.get('/static-page')
+    assert 'Set-Cookie' not in response.headers
+    assert redis.commands == []
+
+
+def test_empty_session_is_not_stored(client, redis_cache):
+    response = client.get('/get')
+    assert 'Set-Cookie' not in response.headers
+    assert stored_sids(redis_cache) == set()
+
+
+def test_cookie_is_only_set_on_create(client, redis_cache):
+    response = client.get('/set/a')
+    assert 'Set-Cookie' in response.headers
+    assert stored_sids(redis_cache) == {sid(client)}
+
+    response = client.get('/set/b')
+    assert 'Set-Cookie' not in response.headers
+    assert client.get('/get').text == 'b'
+
+
+def test_unchanged_session_is_not_written(client, redis):
+    client.get('/set/a')
+    redis.commands.clear()
+    client.get('/set/a')
+    assert redis.commands == ['get']
+
+
+def test_regenerate_rotates_session_id(client, redis_cache):
+    client.get('/set/a')
+    old_sid = sid(client)
+
+    response = client.get('/login')
+    assert 'Set-Cookie' in response.headers
+    assert sid(client) != old_sid
+    assert stored_sids(redis_cache) == {sid(client)}
+    assert client.get('/get').text == 'a'
+
+
+def test_forged_session_id_is_not_adopted(client, redis_cache):
+    client.set_cookie(COOKIE, 'forged')
+    response = client.get('/set/a')
+    assert 'Set-Cookie' in response.headers
+    assert sid(client) != 'forged'
+    assert stored_sids(redis_cache) == {sid(client)}
+
+
+def test_expired_session_id_is_not_adopted(client, redis_cache):
+    client.get('/set/a')
+    expired_sid = sid(client)
+    redis_cache.delete(f'odp.test.session.{expired_sid}')
+
+    assert client.get('/get').text == ''
+    response = client.get('/set/b')
+    assert 'Set-Cookie' in response.headers
+    assert sid(client) != expired_sid
+    assert stored_sids(redis_cache) == {sid(client)}
+
+
+def test_permanent_session_is_refreshed(app, client, redis, redis_cache):
+    app.config['SESSION_REFRESH_EACH_REQUEST'] = True
+    client.get('/set-permanent/a')
+    redis_cache.expire(f'odp.test.session.{sid(client)}', 60)
+    redis.commands.clear()
+
+    response = client.get('/set-permanent/a')
+    assert 'Set-Cookie' in response.headers
+    assert redis.commands == ['get', 'expire']
+    assert redis_cache.ttl(f'odp.test.session.{sid(client)}') > 60
+
+
+def test_permanent_session_is_not_refreshed_unless_configured(app, client, redis):
+    app.config['SESSION_REFRESH_EACH_REQUEST'] = False
+    client.get('/set-permanent/a')
+    redis.commands.clear()
+
+    response = client.get('/set-permanent/a')
+    assert 'Set-Cookie' not in response.headers
+    assert redis.commands == ['get']
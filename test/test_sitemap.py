@@ -0,0 +1,109 @@
+import gzip
+import re
+
+import pytest
+
+from odp.ui.base.lib import catalog_search
+from odp.ui.base.lib.sitemap import URL_LIMIT, Sitemap, encode
+
+CATALOG_ID = 'SAEON'
+EXPIRY = 3600
+
+
+def sitemap_xml(url_count):
+    urls = ''.join(f'<url><loc>https://example.org/{i}</loc></url>\n' for i in range(url_count))
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" xmlns:image="image">\n'
+        f'{urls}</urlset>\n'
+    )
+
+
+@pytest.fixture
+def catalog(cli, app_context):
+    catalog = {'timestamp': 't1', 'data': {'sitemap.xml': sitemap_xml(3)}}
+    cli.handler = lambda path: catalog
+    return catalog
+
+
+def expire_stamp():
+    catalog_search.search_cache.delete(CATALOG_ID, 'stamp')
+
+
+def locs(xml):
+    return [int(n) for n in re.findall(r'<loc>https://example.org/(\d+)</loc>', xml)]
+
+
+def test_sitemap_is_cached(cli, catalog):
+    sitemap = Sitemap.get(CATALOG_ID, EXPIRY)
+    assert sitemap.url_count == 3
+    assert not sitemap.is_index
+    assert Sitemap.get(CATALOG_ID, EXPIRY) == sitemap
+    assert len(cli.calls) == 1
+
+
+def test_expired_stamp_costs_one_call(cli, catalog):
+    sitemap = Sitemap.get(CATALOG_ID, EXPIRY)
+    expire_stamp()
+    assert Sitemap.get(CATALOG_ID, EXPIRY) == sitemap
+    assert len(cli.calls) == 2
+
+
+def test_sitemap_is_rebuilt_when_catalog_publishes(cli, catalog):
+    Sitemap.get(CATALOG_ID, EXPIRY)
+    catalog |= {'timestamp': 't2', 'data': {'sitemap.xml': sitemap_xml(5)}}
+    expire_stamp()
+
+    sitemap = Sitemap.get(CATALOG_ID, EXPIRY)
+    assert sitemap.stamp == 't2'
+    assert locs(''.join(sitemap.iter_chunk(0))) == list(range(5))
+    assert len(cli.calls) == 2
+
+
+def test_missing_sitemap_is_cached(cli, catalog):
+    del catalog['data']['sitemap.xml']
+    assert Sitemap.get(CATALOG_ID, EXPIRY) is None
+    assert Sitemap.get(CATALOG_ID, EXPIRY) is None
+    assert len(cli.calls) == 1
+
+    catalog |= {'timestamp': 't2', 'data': {'sitemap.xml': sitemap_xml(1)}}
+    expire_stamp()
+    assert Sitemap.get(CATALOG_ID, EXPIRY).url_count == 1
+
+
+@pytest.mark.parametrize('url_count, chunk_count', [
+    (0, 1),
+    (1, 1),
+    (URL_LIMIT, 1),
+    (URL_LIMIT + 1, 2),
+    (2 * URL_LIMIT + 1, 3),
+])
+def test_chunks(catalog, url_count, chunk_count):
+    catalog['data']['sitemap.xml'] = sitemap_xml(url_count)
+    sitemap = Sitemap.get(CATALOG_ID, EXPIRY)
+    assert sitemap.chunk_count == chunk_count
+    assert sitemap.is_index == (chunk_count > 1)
+
+    chunks = [''.join(sitemap.iter_chunk(chunk)) for chunk in range(chunk_count)]
+    assert [loc for chunk in chunks for loc in locs(chunk)] == list(range(url_count))
+    for chunk in chunks:
+        assert chunk.startswith('<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns=')
+        assert 'xmlns:image="image"' in chunk
+        assert chunk.endswith('</urlset>\n')
+        assert len(locs(chunk)) <= URL_LIMIT
+
+
+def test_index(catalog):
+    sitemap = Sitemap.get(CATALOG_ID, EXPIRY)
+    index = ''.join(sitemap.iter_index(['https://example.org/sitemap-1.xml', 'https://example.org/sitemap-2.xml']))
+    assert index.count('<sitemap><loc>') == 2
+    assert index.startswith('<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex ')
+    assert index.endswith('</sitemapindex>\n')
+
+
+@pytest.mark.parametrize('use_gzip', [False, True])
+def test_encode(catalog, use_gzip):
+    sitemap = Sitemap.get(CATALOG_ID, EXPIRY)
+    xml = ''.join(sitemap.iter_chunk(0))
+    data = b''.join(encode(sitemap.iter_chunk(0), use_gzip))
+    assert (gzip.decompress(data) if use_gzip else data) == xml.encode()
@@ -0,0 +1,28 @@
+import logging
+
+from odp.ui.transport import Transport, TransportConfig
+
+
+def test_stats_are_logged_at_most_every_interval(caplog, monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr('odp.ui.transport.time.monotonic', lambda: now)
+    transport = Transport(TransportConfig(stats_interval=60))
+    caplog.set_level(logging.DEBUG, logger='odp.ui.transport')
+
+    transport.log_stats()
+    now += 59
+    transport.log_stats()
+    assert not caplog.records
+
+    now += 1
+    transport.log_stats()
+    transport.log_stats()
+    assert [r.getMessage() for r in caplog.records] == ['HTTP transport stats: {}']
+
+
+def test_stats_are_not_collected_unless_logged(caplog, monkeypatch):
+    transport = Transport(TransportConfig(stats_interval=0))
+    monkeypatch.setattr(transport, 'stats', lambda: 1 / 0)
+    caplog.set_level(logging.INFO, logger='odp.ui.transport')
+    transport.log_stats()
+    assert not caplog.records
@@ -0,0 +1,199 @@
+import hashlib
+import io
+import os
+import threading
+import time
+
+import pytest
+
+from odp.ui.base.lib import uploads
+from odp.ui.base.lib.uploads import ChunkedUpload, UploadError
+
+DATA = os.urandom(250000)
+CHUNK_SIZE = 100000
+
+
+@pytest.fixture
+def upload(app_context):
+    return ChunkedUpload.create(
+        package_id='package',
+        user_id='user',
+        filename='data.bin',
+        size=len(DATA),
+        unpack=False,
+        title=None,
+        description=None,
+    )
+
+
+def append(upload, offset, data=None, sha256=None):
+    data = DATA[offset:offset + CHUNK_SIZE] if data is None else data
+    upload.append(
+        io.BytesIO(data),
+        offset=offset,
+        sha256=sha256 or hashlib.sha256(data).hexdigest(),
+        max_size=CHUNK_SIZE,
+    )
+
+
+def append_all(upload):
+    for offset in range(upload.offset, upload.size, CHUNK_SIZE):
+        append(ChunkedUpload.load(upload.id), offset)
+
+
+def wait_for_commit(upload_id):
+    deadline = time.monotonic() + 5
+    while (upload := ChunkedUpload.load(upload_id)).status == 'committing':
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return upload
+
+
+def test_chunks_are_appended_in_order(upload):
+    append_all(upload)
+    upload = ChunkedUpload.load(upload.id)
+    assert upload.offset == upload.size
+    assert upload.complete
+    assert upload.path.read_bytes() == DATA
+
+
+def test_resume_from_last_acknowledged_chunk(upload):
+    append(upload, 0)
+    resumed = ChunkedUpload.load(upload.id)
+    assert resumed.offset == CHUNK_SIZE
+    assert not resumed.complete
+
+    append_all(resumed)
+    assert ChunkedUpload.load(upload.id).path.read_bytes() == DATA
+
+
+@pytest.mark.parametrize('offset', [0, 2 * CHUNK_SIZE])
+def test_chunk_at_wrong_offset_is_rejected(upload, offset):
+    append(upload, 0)
+    stale = ChunkedUpload.load(upload.id)
+    stale.offset = offset  # e.g. loaded before another worker appended
+    with pytest.raises(UploadError) as excinfo:
+        append(stale, offset)
+
+    assert excinfo.value.status_code == 409
+    assert ChunkedUpload.load(upload.id).offset == CHUNK_SIZE
+
+
+def test_chunk_checksum_mismatch_is_rolled_back(upload):
+    append(upload, 0)
+    with pytest.raises(UploadError) as excinfo:
+        append(upload, CHUNK_SIZE, sha256='0' * 64)
+
+    assert excinfo.value.status_code == 400
+    assert ChunkedUpload.load(upload.id).offset == CHUNK_SIZE
+    assert upload.path.read_bytes() == DATA[:CHUNK_SIZE]
+
+
+def test_chunk_beyond_size_is_rejected(upload):
+    with pytest.raises(UploadError) as excinfo:
+        append(upload, 0, data=DATA[:CHUNK_SIZE + 1])
+
+    assert excinfo.value.status_code == 413
+    assert ChunkedUpload.load(upload.id).offset == 0
+    assert upload.path.read_bytes() == b''
+
+
+def test_concurrent_append_is_rejected(upload):
+    uploads.upload_cache.add(upload.id, 'lock', value='other', expiry=60)
+    with pytest.raises(UploadError) as excinfo:
+        append(upload, 0)
+
+    assert excinfo.value.status_code == 409
+    assert uploads.upload_cache.get(upload.id, 'lock') == 'other'
+
+
+def test_incomplete_upload_is_not_committed(upload):
+    append(upload, 0)
+    assert not ChunkedUpload.load(upload.id).commit(lambda f, sha256: None)
+    assert ChunkedUpload.load(upload.id).status == 'uploading'
+
+
+def test_commit(upload):
+    sent = []
+    append_all(upload)
+    assert ChunkedUpload.load(upload.id).commit(lambda f, sha256: sent.append((f.read(), sha256)))
+
+    upload = wait_for_commit(upload.id)
+    assert upload.status == 'done'
+    assert sent == [(DATA, hashlib.sha256(DATA).hexdigest())]
+    assert not upload.path.exists()
+
+    # a committed upload is not committed again
+    assert not upload.commit(lambda f, sha256: sent.append(sha256))
+    assert len(sent) == 1
+
+
+def test_no_append_or_second_commit_while_committing(upload):
+    release = threading.Event()
+    append_all(upload)
+    assert ChunkedUpload.load(upload.id).commit(lambda f, sha256: release.wait())
+
+    upload = ChunkedUpload.load(upload.id)
+    assert upload.status == 'committing'
+    assert not upload.commit(lambda f, sha256: None)
+    with pytest.raises(UploadError) as excinfo:
+        append(upload, upload.size, data=b'')
+    assert excinfo.value.status_code == 409
+
+    release.set()
+    assert wait_for_commit(upload.id).status == 'done'
+
+
+def test_failed_commit_may_be_retried(upload):
+    def reject(f, sha256):
+        raise UploadError(422, 'Rejected')
+
+    append_all(upload)
+    ChunkedUpload.load(upload.id).commit(reject)
+    upload = wait_for_commit(upload.id)
+    assert (upload.status, upload.error) == ('failed', 'Rejected')
+    assert upload.path.exists()
+
+    assert upload.commit(lambda f, sha256: None)
+    assert wait_for_commit(upload.id).status == 'done'
+
+
+def test_dead_commit_is_reported_as_failed(upload):
+    append_all(upload)
+    upload = ChunkedUpload.load(upload.id)
+    upload.status = 'committing'
+    upload.save()  # as left by a worker that died, its commit lock having expired
+
+    loaded = ChunkedUpload.load(upload.id)
+    assert loaded.status == 'failed'
+    # loading does not change the stored state
+    assert uploads.upload_cache.jget(upload.id)['status'] == 'committing'
+
+    assert loaded.commit(lambda f, sha256: None)
+    assert wait_for_commit(upload.id).status == 'done'
+
+
+def test_commit_lock_is_renewed_while_committing(upload, monkeypatch):
+    monkeypatch.setattr(uploads, 'COMMIT_LOCK_EXPIRY', 1)
+    release = threading.Event()
+    append_all(upload)
+    ChunkedUpload.load(upload.id).commit(lambda f, sha256: release.wait())
+
+    time.sleep(2)  # past the lock expiry
+    upload = ChunkedUpload.load(upload.id)
+    assert upload.status == 'committing'
+    assert not upload.commit(lambda f, sha256: None)
+
+    release.set()
+    assert wait_for_commit(upload.id).status == 'done'
+    assert uploads.upload_cache.get(upload.id, 'commit') is None
+
+
+def test_sweep_removes_abandoned_spool_files(upload):
+    abandoned = ChunkedUpload.create(**{
+        field: value for field, value in upload.__dict__.items() if field != 'id'
+    })
+    os.utime(abandoned.path, (0, 0))
+    ChunkedUpload.sweep()
+    assert not abandoned.path.exists()
+    assert upload.path.exists()
@@ -0,0 +1,17 @@
+import pytest
+from flask import Flask
+
+from odp.ui.base.views import vocabulary
+
+
+@pytest.fixture
+def client():
+    # an app that serves vocabularies but has no user API client
+    app = Flask(__name__)
+    app.register_blueprint(vocabulary.bp, url_prefix='/vocabulary')
+    return app.test_client()
+
+
+def test_autocomplete_needs_user_api_client(client):
+    assert client.get('/vocabulary/Institution/autocomplete?q=uni').status_code == 404
+